@@ -4,27 +4,122 @@ import webbrowser
 from tkinter.scrolledtext import ScrolledText
 import pyperclip
 from auto_updater import AutoUpdater  # 导入自动更新器
+from parse_engine import ParseEngine, TEST_VIDEO_URL, NETWORK_TEST_URLS  # 导入解析核心
+from health_store import HealthStore  # 导入线路健康数据存储
+from result_cache import DiskCache  # 导入磁盘缓存
+from dns_cache import DNSCache  # 导入域名解析缓存
+from cancellation import CancelToken, Cancelled  # 导入取消令牌
+from video_platforms import canonical_key  # 导入视频链接归一化
 import json
 import os
-import concurrent.futures
 import threading
+import queue
 import requests
 import logging
 import datetime
-import time
 from urllib.parse import urlparse
 
 
-def create_retry_strategy():
-    """创建请求重试策略"""
-    return requests.adapters.Retry(
-        total=3,  # 总重试次数
-        backoff_factor=0.5,  # 重试延迟因子
-        status_forcelist=[500, 502, 503, 504],  # 需要重试的HTTP状态码
-        allowed_methods=["HEAD", "GET", "POST"],  # 允许重试的请求方法
-        raise_on_redirect=False,  # 重定向不抛出异常
-        raise_on_status=False  # 状态码错误不抛出异常
-    )
+class UIUpdateQueue:
+    """线程安全的界面更新队列
+
+    工作线程只把更新放进队列，由 Tk 主线程通过 after() 按固定帧率取出执行，
+    一帧内对同一文本框的连续追加合并成一次插入，对同一变量的多次赋值只保留
+    最后一次，每个文本框只滚动一次。更新按放入的顺序执行，已关闭窗口中的
+    控件被跳过。
+    """
+
+    def __init__(self, root, fps=20):
+        """初始化，root 为用于定时刷新的 Tk 窗口"""
+        self.root = root
+        self.interval = max(1, int(1000 / fps))  # 刷新间隔（毫秒）
+        self.logger = logging.getLogger('VIPParser')
+        self._queue = queue.SimpleQueue()
+        self._job = None
+
+    def append(self, text_widget, text, *tags):
+        """在文本框末尾追加文字并滚动到底部"""
+        self._queue.put(('append', text_widget, text, tags))
+
+    def set(self, variable, value):
+        """设置 Tk 变量的值"""
+        self._queue.put(('set', variable, value))
+
+    def call(self, func, *args, **kwargs):
+        """在主线程中调用 func"""
+        self._queue.put(('call', func, args, kwargs))
+
+    def start(self):
+        """开始定时刷新（在主线程调用）"""
+        if self._job is None:
+            self._job = self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        """停止定时刷新"""
+        if self._job is not None:
+            try:
+                self.root.after_cancel(self._job)
+            except tk.TclError:
+                pass
+            self._job = None
+
+    def flush(self):
+        """立即执行队列中的全部更新（在主线程调用），返回合并后的更新数"""
+        ops = []
+        last_set = {}  # 变量 -> 其赋值在 ops 中的位置，遇到函数调用后清空以保持顺序
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            kind = item[0]
+            if kind == 'append':
+                _, widget, text, tags = item
+                if ops and ops[-1][0] == 'append' and ops[-1][1] is widget and ops[-1][3] == tags:
+                    ops[-1][2].append(text)
+                else:
+                    ops.append(['append', widget, [text], tags])
+            elif kind == 'set':
+                _, variable, value = item
+                index = last_set.get(id(variable))
+                if index is None:
+                    last_set[id(variable)] = len(ops)
+                    ops.append(['set', variable, value])
+                else:
+                    ops[index][2] = value
+            else:
+                last_set.clear()
+                ops.append(item)
+
+        scrolled = {}
+        for op in ops:
+            try:
+                if op[0] == 'append':
+                    op[1].insert(tk.END, ''.join(op[2]), *op[3])
+                    scrolled[id(op[1])] = op[1]
+                elif op[0] == 'set':
+                    op[1].set(op[2])
+                else:
+                    op[1](*op[2], **op[3])
+            except tk.TclError:
+                continue  # 控件所在窗口已关闭
+            except Exception as e:
+                self.logger.error(f"界面更新失败: {e}")
+        for widget in scrolled.values():
+            try:
+                widget.see(tk.END)
+            except tk.TclError:
+                pass
+        return len(ops)
+
+    def _drain(self):
+        """定时刷新：执行积累的更新后安排下一帧"""
+        self._job = None
+        self.flush()
+        try:
+            self._job = self.root.after(self.interval, self._drain)
+        except tk.TclError:
+            pass  # 主窗口已销毁
 
 
 class VIPVideoParser:
@@ -35,102 +130,40 @@ class VIPVideoParser:
         self.window.geometry('1000x800')
         self.window.resizable(True, True)
         
+        # 工作线程通过它更新界面，主线程按固定帧率批量刷新
+        self.ui = UIUpdateQueue(self.window)
+        self.ui.start()
+        
         # 设置主题和样式
         self.setup_styles()
         
-        # 初始化API状态
-        self.api_status = {}
-        
-        # 解析接口列表
-        self.api_list = {
-            '线路1 - 稳定(需要VPN)': 'https://jx.playerjy.com/?url=',  # 需要VPN访问
-            '线路2 - 备用': 'https://jx.jsonplayer.com/player/?url=',
-            '线路3 - 通用': 'https://jx.aidouer.net/?url=',
-            '线路4 - 高速': 'https://jx.bozrc.com:4433/player/?url=',
-            '线路5 - 超清': 'https://jx.zhanlangbu.com/?url=',
-            '线路6 - 急速': 'https://jx.ppflv.com/?url=',
-            '线路7 - 优选': 'https://jx.xyflv.com/?url=',
-            '线路8 - 备选': 'https://jx.m3u8.tv/jiexi/?url=',
-            '线路9 - M3U8': 'https://jx.m3u8.pw/?url=',
-            '线路10 - 全能': 'https://jx.xyflv.cc/?url=',
-            '线路11 - 智能': 'https://jx.jsonplayer.net/player/?url=',
-            '线路12 - 解析': 'https://jx.xmflv.com/?url=',
-            '线路13 - 云解析': 'https://jx.yparse.com/index.php?url=',
-            '线路14 - 8090': 'https://www.8090g.cn/?url=',
-            '线路15 - 快速': 'https://api.jiexi.la/?url=',
-            '线路16 - 免费': 'https://www.pangujiexi.cc/jiexi.php?url=',
-            '线路17 - 高清': 'https://www.ckmov.vip/api.php?url=',
-            '线路18 - B站1': 'https://jx.bozrc.com:4433/player/?url=',
-            '线路19 - B站2': 'https://jx.parwix.com:4433/player/?url=',
-            '线路20 - 万能': 'https://jx.ivito.cn/?url=',
-            '线路21 - OK': 'https://okjx.cc/?url=',
-            '线路22 - 夜幕': 'https://www.yemu.xyz/?url=',
-            '线路23 - 虾米': 'https://jx.xmflv.com/?url=',
-            '线路24 - 爱豆': 'https://jx.aidouer.net/?url=',
-            '线路25 - 诺讯': 'https://www.nxflv.com/?url='
-        }
+        # 解析核心（线路、缓存、会话和统计都由它管理），线路统计和解析结果保存在本地，重启后继续使用
+        self.engine = ParseEngine(health_store=HealthStore('line_health.db'),
+                                  disk_cache=DiskCache('parse_cache.db'),
+                                  dns_cache=DNSCache())
+        # 10分钟没有键盘或鼠标操作时暂停后台预热、检测等任务（见 bind_shortcuts）
+        self.engine.scheduler.idle_after = 600
+        # 后台预解析所有线路和网络检测站点的域名，过期前自动刷新
+        self.engine.dns_cache.start_prefetch(
+            self.engine.scheduler,
+            lambda: self.engine.line_hosts() + [urlparse(url).hostname for url in NETWORK_TEST_URLS]
+        )
+        # 后台为排名靠前的线路保持空闲连接，第一次解析不用再等握手
+        self.engine.prewarmer.start()
+        # 后台按排名错开检测线路，保持线路状态和排序为最新
+        self.engine.health_scheduler.start()
         
         # 初始化变量
         self.api_var = tk.StringVar(value='线路1 - 稳定(需要VPN)')
         self.history = []
         self.max_history = 10  # 最多保存10条历史记录
         
-        # 优化缓存管理
-        self.cache = {}
-        self.cache_limit = 100  # 缓存限制
-        self.cache_expire_time = 3600  # 缓存过期时间（秒）
-        self.cache_hits = 0  # 缓存命中次数
-        self.cache_misses = 0  # 缓存未命中次数
-        
         # 启动定期清理缓存的定时器
         self.start_cache_cleanup()
         
         # 网络状态监控
-        self.network_status = {'status': True, 'last_check': time.time()}
         self.start_network_monitor()
         
-        # API性能统计
-        self.api_performance = {}  # 用于存储API响应时间统计
-        
-        # 优化线程池配置
-        self.thread_pool = concurrent.futures.ThreadPoolExecutor(
-            max_workers=min(32, (os.cpu_count() or 1) * 4),  # 根据CPU核心数动态设置
-            thread_name_prefix="VIPParser"
-        )
-        
-        # 优化请求会话配置
-        self.session = requests.Session()
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=100,  # 连接池大小
-            pool_maxsize=100,  # 最大连接数
-            max_retries=create_retry_strategy(),  # 重试策略
-            pool_block=False  # 连接池满时不阻塞
-        )
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Connection': 'keep-alive'
-        })
-        
-        # 优化重试策略配置
-        self.request_timeout = 5  # 将超时时间从10秒减少到5秒
-        self.max_retries = 2  # 将重试次数从3次减少到2次
-        self.retry_delay = 0.5  # 将重试延迟从1秒减少到0.5秒
-        self.retry_backoff = 2  # 重试延迟倍数
-        self.retry_max_delay = 10  # 最大重试延迟（秒）
-        
-        # 添加性能监控
-        self.performance_metrics = {
-            'parse_times': [],  # 解析时间记录
-            'api_response_times': {},  # API响应时间
-            'cache_hits': 0,  # 缓存命中次数
-            'cache_misses': 0,  # 缓存未命中次数
-            'failed_attempts': 0,  # 失败尝试次数
-        }
-        
         # 创建菜单栏
         self.create_menu()
         
@@ -201,7 +234,7 @@ class VIPVideoParser:
             self.radio_frame.grid_columnconfigure(i, weight=1)
         
         # 创建解析线路单选按钮
-        for i, api in enumerate(self.api_list.keys()):
+        for i, api in enumerate(self.engine.api_list.keys()):
             row = i // columns_per_row
             col = i % columns_per_row
             btn_frame = ttk.Frame(self.radio_frame)
@@ -213,6 +246,12 @@ class VIPVideoParser:
                                       value=api)
             radio_btn.grid(padx=2, pady=1, sticky='w')
         
+        # 竞速模式开关
+        self.race_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(line_frame,
+                        text=f"竞速模式（同时检测排名前{self.engine.race_width}的线路，自动使用最先可用的线路）",
+                        variable=self.race_var).pack(anchor='w', pady=(5, 0))
+        
         # 下部分框架
         lower_frame = ttk.Frame(main_paned)
         main_paned.add(lower_frame, weight=1)
@@ -449,7 +488,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
     def parse_video(self):
         """解析视频（支持批量解析）"""
         # 首先检查网络状态
-        if not self.network_status['status']:
+        if not self.engine.network_health.online:
             if not messagebox.askyesno("网络异常",
                 "当前网络连接异常，是否继续尝试解析？"):
                 return
@@ -462,6 +501,26 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
             messagebox.showwarning("警告", "请输入视频链接")
             return
             
+        race_mode = self.race_var.get()
+        
+        # 获取当前选中的解析线路
+        selected_api = self.api_var.get()
+        if not race_mode and (not selected_api or selected_api not in self.engine.api_list):
+            # 如果没有选择线路，尝试使用对第一个链接所属平台表现最好的线路
+            best_api = self.get_best_api(self.engine.validate_url(urls[0]))
+            if best_api:
+                selected_api = best_api
+                self.api_var.set(best_api)
+            else:
+                messagebox.showwarning("警告", "请选择解析线路")
+                return
+        
+        # 检查是否需要VPN
+        if not race_mode and "需要VPN" in selected_api:
+            if not messagebox.askyesno("VPN提示", 
+                "当前选择的解析线路需要开启VPN才能访问。\n是否已开启VPN？"):
+                return
+        
         # 创建批量解析状态窗口
         status_window = tk.Toplevel(self.window)
         status_window.title("批量解析进度")
@@ -469,6 +528,15 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         status_window.transient(self.window)
         status_window.grab_set()
         
+        # 关闭窗口时中断所有进行中的检测
+        cancel_token = CancelToken()
+        
+        def on_status_closing():
+            cancel_token.cancel()
+            status_window.destroy()
+        
+        status_window.protocol("WM_DELETE_WINDOW", on_status_closing)
+        
         # 添加状态标签
         status_label = ttk.Label(status_window, 
                                text=f"正在解析 {len(urls)} 个视频...", 
@@ -484,175 +552,158 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
                                            mode='determinate')
         total_progress_bar.pack(pady=10)
         
-        # 添加当前任务进度条
-        task_progress_var = tk.DoubleVar()
-        task_progress_bar = ttk.Progressbar(status_window, 
-                                          variable=task_progress_var,
-                                          maximum=100, 
-                                          length=500, 
-                                          mode='determinate')
-        task_progress_bar.pack(pady=5)
-        
         # 添加详细信息文本框
         info_text = ScrolledText(status_window, height=15, width=60)
         info_text.pack(pady=10, padx=10, fill=tk.BOTH, expand=True)
         
-        def update_status(text, total_progress=None, task_progress=None):
-            info_text.insert(tk.END, text + "\n")
-            info_text.see(tk.END)
+        def update_status(text, total_progress=None):
+            # 一帧内的多行输出合并成一次插入
+            self.ui.append(info_text, text + "\n")
             if total_progress is not None:
-                total_progress_var.set(total_progress)
-            if task_progress is not None:
-                task_progress_var.set(task_progress)
-            status_window.update()
+                self.ui.set(total_progress_var, total_progress)
         
-        # 获取当前选中的解析线路
-        selected_api = self.api_var.get()
-        if not selected_api or selected_api not in self.api_list:
-            # 如果没有选择线路，尝试使用性能最好的线路
-            best_api = self.get_best_api()
-            if best_api:
-                selected_api = best_api
-                self.api_var.set(best_api)
+        # 竞速模式下候选线路为该平台排名靠前的几条，否则只使用选中的线路
+        if race_mode:
+            candidates = None
+            fail_text = "解析失败: 候选线路均不可用"
+        else:
+            candidates = [selected_api]
+            if self.engine.is_circuit_open(selected_api):
+                fail_text = "解析失败: 当前解析线路连续失败，已暂时熔断，请稍后重试或更换线路"
             else:
-                messagebox.showwarning("警告", "请选择解析线路")
-                status_window.destroy()
-                return
+                fail_text = "解析失败: 当前解析线路不可用"
+        
+        results = queue.Queue()  # 工作线程完成的结果，由主线程取出
+        pending = []  # 需要联网检测的任务
+        video_keys = {}  # 任务序号 -> 视频标识，每个链接只解析一次
+        state = {'done': 0, 'success': 0}
+        metrics = self.engine.performance_metrics
+        hedge_base = (metrics['hedged_requests'], metrics['hedge_wins'])
+        coalesced_base = metrics['coalesced_requests']
+        
+        # 先在主线程完成格式校验和缓存命中（不涉及网络）
+        for i, url in enumerate(urls):
+            platform, video_key = self.engine.video_identity(url)
+            if not platform:
+                results.put((i, url, False, f"错误：无效的视频网站链接 - {url}", False))
+                continue
+            video_keys[i] = video_key
+            
+            lines = candidates
+            if lines is None:
+                lines = self.engine.rank_lines(platform=platform)[:self.engine.race_width]
+            for api_name in lines:
+                cached_result = self.engine.get_from_cache(
+                    self.engine.cache_key(api_name, url, video_key))
+                if cached_result:
+                    results.put((i, url, True, (api_name, cached_result), True))
+                    break
+            else:
+                pending.append((i, url, platform, video_key))
         
-        # 检查是否需要VPN
-        if "需要VPN" in selected_api:
-            if not messagebox.askyesno("VPN提示", 
-                "当前选择的解析线路需要开启VPN才能访问。\n是否已开启VPN？"):
-                status_window.destroy()
-                return
+        # 按并发上限滑动提交，由主线程在取结果时补足，完成一个再补一个
+        pending_iter = iter(pending)
+        in_flight = set()  # 已提交、结果尚未取出的任务序号（只在主线程访问）
         
-        try:
-            success_count = 0
-            for i, url in enumerate(urls):
-                try:
-                    update_status(f"\n开始解析第 {i+1}/{len(urls)} 个视频:", 
-                                total_progress=i)
-                    
-                    # 验证URL格式
-                    if not self._validate_url(url):
-                        update_status(f"错误：无效的视频网站链接 - {url}", 
-                                    task_progress=0)
-                        continue
-                    
-                    # 检查缓存
-                    cache_key = f"{selected_api}_{url}"
-                    cached_result = self._get_from_cache(cache_key)
-                    if cached_result:
-                        update_status("使用缓存记录...", task_progress=50)
-                        webbrowser.open(cached_result)
-                        update_status("解析完成！", task_progress=100)
-                        success_count += 1
-                        continue
-                    
-                    # 添加到历史记录
-                    self.add_to_history(url)
-                    update_status("已保存到历史记录", task_progress=30)
-                    
-                    # 构造解析URL
-                    api_url = self.api_list[selected_api]
-                    parse_url = api_url + url
-                    update_status("正在连接解析服务器...", task_progress=60)
-                    
-                    # 测试解析链接可用性
-                    if not self._check_url_availability(parse_url):
-                        raise Exception("当前解析线路不可用")
-                    
-                    update_status("正在打开解析链接...", task_progress=80)
-                    webbrowser.open(parse_url)
-                    
-                    # 添加到缓存
-                    self._add_to_cache(cache_key, parse_url)
-                    update_status("已缓存解析结果", task_progress=90)
-                    
-                    success_count += 1
-                    update_status("解析完成！", task_progress=100)
-                    
-                except Exception as e:
-                    update_status(f"解析失败: {str(e)}", task_progress=0)
-                    if selected_api in self.api_performance:
-                        self.api_performance[selected_api]['fail_count'] += 1
-                    continue
-            
-            # 更新总进度
-            total_progress_var.set(len(urls))
+        def top_up():
+            """补足进行中的任务到并发上限
+
+            不在完成回调里提交下一个：Future 已完成时回调会同步执行，
+            连续快速失败会层层递归直到栈溢出。
+            """
+            while not cancel_token.cancelled and len(in_flight) < self.engine.batch_concurrency:
+                item = next(pending_iter, None)
+                if item is None:
+                    return
+                index, url, platform, video_key = item
+                in_flight.add(index)
+                if race_mode:
+                    future = self.engine.race_lines_async(url, token=cancel_token,
+                                                          video_key=video_key, platform=platform)
+                else:
+                    future = self.engine.hedged_probe_async(selected_api, url, token=cancel_token,
+                                                            video_key=video_key, platform=platform)
+                future.add_done_callback(lambda f, index=index, url=url: on_done(index, url, f))
+        
+        def on_done(index, url, future):
+            try:
+                winner = future.result()
+                if winner:
+                    results.put((index, url, True, winner, False))
+                else:
+                    results.put((index, url, False, fail_text, False))
+            except Exception as e:
+                results.put((index, url, False, f"解析失败: {str(e)}", False))
+        
+        top_up()
+        
+        def finish():
+            """全部任务完成后的收尾"""
+            update_status(f"\n批量解析完成！成功: {state['success']}/{len(urls)}",
+                          total_progress=len(urls))
+            self.status_var.set(f"批量解析完成 - 成功率: {state['success']}/{len(urls)}")
             
-            # 显示最终结果
-            update_status(f"\n批量解析完成！成功: {success_count}/{len(urls)}")
-            self.status_var.set(f"批量解析完成 - 成功率: {success_count}/{len(urls)}")
+            # 对冲请求带来的额外请求量
+            hedged = metrics['hedged_requests'] - hedge_base[0]
+            if hedged:
+                update_status(f"对冲请求: {hedged} 次，其中备用线路先返回 {metrics['hedge_wins'] - hedge_base[1]} 次")
+            coalesced = metrics['coalesced_requests'] - coalesced_base
+            if coalesced:
+                update_status(f"合并重复检测: {coalesced} 次")
             
             # 优化API顺序
             self.optimize_api_order()
             
-        except Exception as e:
-            update_status(f"发生错误：{str(e)}")
-            self.logger.error(f"批量解析失败: {str(e)}")
-            messagebox.showerror("错误", f"批量解析失败: {str(e)}")
-        
-        # 添加关闭按钮
-        ttk.Button(status_window, 
-                  text="关闭", 
-                  command=status_window.destroy).pack(pady=10)
-
-    def _validate_url(self, url):
-        """验证URL格式"""
-        valid_domains = [
-            'iqiyi.com', 'v.qq.com', 'youku.com', 'mgtv.com', 
-            'bilibili.com', 'tv.sohu.com', 'pptv.com', '1905.com'
-        ]
-        try:
-            result = urlparse(url)
-            return all([
-                result.scheme in ['http', 'https'],
-                any(domain in result.netloc.lower() for domain in valid_domains)
-            ])
-        except:
-            return False
-
-    def _check_url_availability(self, url):
-        """检查URL可用性（优化版本）"""
-        for attempt in range(self.max_retries):
+            # 添加关闭按钮
+            ttk.Button(status_window, 
+                      text="关闭", 
+                      command=status_window.destroy).pack(pady=10)
+        
+        def drain():
+            """主线程定时取出已完成的结果并刷新界面"""
+            if not status_window.winfo_exists():
+                return
             try:
-                response = self.session.head(
-                    url,
-                    timeout=self.request_timeout,
-                    allow_redirects=True,
-                    verify=False
-                )
-                
-                if response.status_code == 200:
-                    return True
-                return False
-                    
+                while True:
+                    try:
+                        item = results.get_nowait()
+                    except queue.Empty:
+                        # 补提交的任务可能立即完成（如线路全部熔断），结果取完为止
+                        top_up()
+                        if results.empty():
+                            break
+                        continue
+                    index, url, ok, result, cached = item
+                    in_flight.discard(index)
+                    state['done'] += 1
+                    update_status(f"\n第 {index+1}/{len(urls)} 个视频:", 
+                                  total_progress=state['done'])
+                    if ok:
+                        api_name, parse_url = result
+                        if race_mode or api_name != selected_api:
+                            update_status(f"使用线路: {api_name}")
+                        if cached:
+                            update_status("使用缓存记录...")
+                        else:
+                            self.add_to_history(url)
+                            self.engine.add_to_cache(self.engine.cache_key(api_name, url, video_keys[index]),
+                                                    parse_url)
+                            update_status("已保存到历史记录，已缓存解析结果")
+                        webbrowser.open(parse_url)
+                        state['success'] += 1
+                        update_status("解析完成！")
+                    else:
+                        update_status(result)
             except Exception as e:
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                    continue
-                return False
-
-    def _get_from_cache(self, key):
-        """从缓存获取数据"""
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if time.time() - timestamp < self.cache_expire_time:
-                self.cache_hits += 1
-                return data
+                update_status(f"发生错误：{str(e)}")
+                self.logger.error(f"批量解析失败: {str(e)}")
+            
+            if state['done'] >= len(urls):
+                finish()
             else:
-                del self.cache[key]
-        self.cache_misses += 1
-        return None
-
-    def _add_to_cache(self, key, value):
-        """添加数据到缓存"""
-        self.cache[key] = (value, time.time())
-        # 如果缓存超出限制，删除最早的条目
-        if len(self.cache) > self.cache_limit:
-            oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k][1])
-            del self.cache[oldest_key]
+                status_window.after(50, drain)
+        
+        drain()
 
     def check_update(self):
         """检查更新"""
@@ -942,10 +993,12 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         try:
             self.save_config()  # 保存配置
             self.save_history()  # 保存历史记录
+            self.engine.close()  # 保存线路统计、停止后台任务并释放连接
             self.logger.info("程序正常退出")
         except Exception as e:
             self.logger.error(f"保存数据失败: {e}")
             print(f"保存数据失败: {e}")
+        self.ui.stop()
         self.window.destroy()
 
     def create_menu(self):
@@ -1115,7 +1168,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         progress_var = tk.DoubleVar()
         progress_bar = ttk.Progressbar(main_frame,
                                      variable=progress_var,
-                                     maximum=len(self.api_list),
+                                     maximum=len(self.engine.api_list),
                                      mode='determinate',
                                      length=460)
         progress_bar.pack(fill=tk.X, pady=10)
@@ -1124,25 +1177,27 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         btn_frame = ttk.Frame(main_frame)
         btn_frame.pack(fill=tk.X, pady=10)
         
-        # 用于控制检测的标志
+        # 用于控制检测的标志，停止时通过取消令牌中断进行中的请求
         is_checking = threading.Event()
+        check_state = {'token': CancelToken()}
         
         def start_check():
             """开始检测"""
             start_btn.configure(state='disabled')
             stop_btn.configure(state='normal')
+            check_state['token'] = CancelToken()
             is_checking.set()
             result_text.delete(1.0, tk.END)
             progress_var.set(0)
-            threading.Thread(target=update_api_status, daemon=True).start()
+            self.engine.thread_pool.submit(update_api_status)
         
         def stop_check():
             """停止检测"""
             is_checking.clear()
+            check_state['token'].cancel()
             start_btn.configure(state='normal')
             stop_btn.configure(state='disabled')
-            result_text.insert(tk.END, "\n检测已停止！\n")
-            result_text.see(tk.END)
+            self.ui.append(result_text, "\n检测已停止！\n")
         
         # 创建按钮
         start_btn = ttk.Button(btn_frame, text="开始检测",
@@ -1157,38 +1212,41 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
                             width=15)
         stop_btn.pack(side=tk.LEFT, padx=5)
         
-        def check_api(api_name, api_url):
-            """检查单个API的可用性"""
+        def write(text, *tags):
+            """在结果区追加文字（工作线程中调用，由主线程批量刷新）"""
+            self.ui.append(result_text, text, *tags)
+        
+        def check_api(names, api_url, token):
+            """检查单个API的可用性，names 为指向同一接口的全部线路名称，只检测一次"""
+            api_name = names[0]
             try:
                 if not is_checking.is_set():
                     return False, 0
                 
-                result_text.insert(tk.END, f"\n正在检测 {api_name}")
-                result_text.see(tk.END)
-                
-                test_url = "https://www.iqiyi.com/v_19rr1skq2c.html"
+                write(f"\n正在检测 {' / '.join(names)}")
                 
                 try:
-                    parse_url = api_url + test_url
-                    if self._check_url_availability(parse_url):
-                        result_text.insert(tk.END, " ✓ 可用\n", "success")
+                    deadline = self.engine.retry_policy.new_deadline(token)
+                    if self.engine.probe_line(api_name, TEST_VIDEO_URL, api_url,
+                                              skip_known_bad=False, deadline=deadline):
+                        write(" ✓ 可用\n", "success")
                         is_available = True
                     else:
-                        result_text.insert(tk.END, " ✗ 不可用\n", "error")
+                        write(" ✗ 不可用\n", "error")
                         is_available = False
                         
-                    result_text.see(tk.END)
-                    self.api_status[api_name] = is_available
+                    for name in names:
+                        self.engine.api_status[name] = is_available
                     return is_available, 1 if is_available else 0
                     
+                except Cancelled:
+                    return False, 0
                 except Exception:
-                    result_text.insert(tk.END, " - 连接超时\n")
-                    result_text.see(tk.END)
+                    write(" - 连接超时\n")
                     return False, 0
                 
             except Exception:
-                result_text.insert(tk.END, " - 检测失败\n")
-                result_text.see(tk.END)
+                write(" - 检测失败\n")
                 return False, 0
         
         # 配置文本标签样式
@@ -1197,57 +1255,62 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         
         def update_api_status():
             """更新所有API状态"""
+            token = check_state['token']
             try:
-                result_text.delete(1.0, tk.END)
-                result_text.insert(tk.END, "开始检测解析线路...\n")
-                result_text.insert(tk.END, "=" * 40 + "\n")
+                self.ui.call(result_text.delete, 1.0, tk.END)
+                write("开始检测解析线路...\n")
+                write("=" * 40 + "\n")
                 
                 api_results = []
                 available_count = 0
-                total_count = len(self.api_list)
-                available_apis = {}
+                total_count = len(self.engine.api_list)
+                available_apis = []
                 
-                for i, (api_name, api_url) in enumerate(self.api_list.items()):
+                checked = 0
+                for names in self.engine.endpoint_groups().values():
                     if not is_checking.is_set():
                         break
                         
                     try:
-                        is_available, success_count = check_api(api_name, api_url)
+                        is_available, success_count = check_api(names, self.engine.api_list[names[0]], token)
                         if is_available:
-                            api_results.append((api_name, api_url, success_count))
-                            available_count += 1
-                            available_apis[api_name] = api_url
+                            for api_name in names:
+                                api_url = self.engine.api_list[api_name]
+                                api_results.append((api_name, api_url, success_count))
+                                available_count += 1
+                                available_apis.append(api_name)
                     except Exception as e:
-                        result_text.insert(tk.END, f"\n{api_name}: ✗ 检测失败 ({str(e)})\n")
-                        result_text.insert(tk.END, "-" * 40 + "\n")
+                        write(f"\n{' / '.join(names)}: ✗ 检测失败 ({str(e)})\n")
+                        write("-" * 40 + "\n")
                     
-                    progress_var.set(i + 1)
+                    checked += len(names)
+                    self.ui.set(progress_var, checked)
                 
                 if is_checking.is_set():
-                    result_text.insert(tk.END, "\n" + "=" * 40 + "\n")
-                    result_text.insert(tk.END, "检测完成！\n")
-                    result_text.insert(tk.END, f"可用线路: {available_count}/{total_count}\n")
+                    write("\n" + "=" * 40 + "\n")
+                    write("检测完成！\n")
+                    write(f"可用线路: {available_count}/{total_count}\n")
                     
                     if api_results:
                         api_results.sort(key=lambda x: x[2], reverse=True)
                         best_api = api_results[0][0]
-                        self.api_list = available_apis
-                        self.update_api_radio_buttons()
-                        self.api_var.set(best_api)
-                        result_text.insert(tk.END, f"\n已自动选择最佳线路: {best_api}\n")
-                        result_text.insert(tk.END, "\n可用解析线路:\n")
-                        for api_name in available_apis.keys():
-                            result_text.insert(tk.END, f"✓ {api_name}\n")
+                        # 只更新状态和排序，不可用的线路保留在列表中，恢复后还能继续使用
+                        self.ui.call(self.optimize_api_order)
+                        self.ui.set(self.api_var, best_api)
+                        write(f"\n已自动选择最佳线路: {best_api}\n")
+                        write("\n可用解析线路:\n")
+                        for api_name in available_apis:
+                            write(f"✓ {api_name}\n")
                     else:
-                        result_text.insert(tk.END, "\n没有找到可用的解析线路！\n")
-                        result_text.insert(tk.END, "请稍后重试或检查网络连接。\n")
+                        write("\n没有找到可用的解析线路！\n")
+                        write("请稍后重试或检查网络连接。\n")
                     
-                    self.save_config()
+                    self.ui.call(self.save_config)
                 
             finally:
-                start_btn.configure(state='normal')
-                stop_btn.configure(state='disabled')
                 is_checking.clear()
+                self.ui.call(start_btn.configure, state='normal')
+                self.ui.call(stop_btn.configure, state='disabled')
         
         def on_closing():
             stop_check()
@@ -1280,7 +1343,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
             self.radio_frame.grid_columnconfigure(i, weight=1)
         
         # 重新创建单选按钮
-        for i, api in enumerate(self.api_list.keys()):
+        for i, api in enumerate(self.engine.api_list.keys()):
             row = i // columns_per_row
             col = i % columns_per_row
             btn_frame = ttk.Frame(self.radio_frame)
@@ -1318,8 +1381,9 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
             print(f"保存历史记录失败: {e}")
     
     def add_to_history(self, url):
-        """添加URL到历史记录"""
-        if url not in self.history:
+        """添加URL到历史记录（同一视频的不同链接只保存一次）"""
+        key = canonical_key(url)
+        if all(canonical_key(item) != key for item in self.history):
             self.history.insert(0, url)
             if len(self.history) > self.max_history:
                 self.history.pop()
@@ -1339,7 +1403,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
                     config = json.load(f)
                     # 加载API列表
                     if 'api_list' in config:
-                        self.api_list.update(config['api_list'])
+                        self.engine.api_list.update(config['api_list'])
                     # 加载默认线路
                     if 'default_api' in config:
                         self.api_var.set(config['default_api'])
@@ -1353,7 +1417,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         """保存配置"""
         try:
             config = {
-                'api_list': self.api_list,
+                'api_list': self.engine.api_list,
                 'default_api': self.api_var.get(),
                 'window_size': self.window.geometry()
             }
@@ -1362,17 +1426,9 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         except Exception as e:
             print(f"保存配置失败: {e}")
 
-    def add_to_cache(self, url, result):
-        """添加结果到缓存"""
-        self.cache[url] = result
-        # 如果缓存超出限制，删除最早的条目
-        if len(self.cache) > self.cache_limit:
-            oldest_url = next(iter(self.cache))
-            del self.cache[oldest_url]
-            
     def clear_cache(self):
         """清空缓存"""
-        self.cache.clear()
+        self.engine.clear_cache()
 
     def setup_logging(self):
         """配置日志系统"""
@@ -1414,6 +1470,9 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         self.window.bind('<F5>', lambda e: self.check_api_availability())
         # F1：显示帮助
         self.window.bind('<F1>', lambda e: self.show_help())
+        # 任意键盘或鼠标操作都算活跃，空闲时暂停的后台任务随即恢复
+        self.window.bind_all('<Any-KeyPress>', lambda e: self.engine.scheduler.touch(), add='+')
+        self.window.bind_all('<Any-ButtonPress>', lambda e: self.engine.scheduler.touch(), add='+')
 
     def manage_api_list(self):
         """管理解析线路"""
@@ -1452,7 +1511,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # 添加现有线路
-        for name, url in self.api_list.items():
+        for name, url in self.engine.api_list.items():
             tree.insert('', tk.END, values=(name, url))
         
         # 按钮框架
@@ -1525,7 +1584,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
                 messagebox.showwarning("警告", "至少需要保留一条解析线路")
                 return
                 
-            self.api_list = new_api_list
+            self.engine.api_list = new_api_list
             self.update_api_radio_buttons()
             self.save_config()
             manage_window.destroy()
@@ -1540,10 +1599,8 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
     def __del__(self):
         """析构函数：清理资源"""
         try:
-            # 关闭线程池
-            self.thread_pool.shutdown(wait=False)
-            # 关闭会话
-            self.session.close()
+            # 关闭线程池和会话
+            self.engine.close()
         except:
             pass
 
@@ -1688,87 +1745,28 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
                            font=('微软雅黑', 10))
 
     def start_cache_cleanup(self):
-        """启动定期清理缓存的定时器"""
-        def cleanup():
-            while True:
-                try:
-                    self.clean_expired_cache()
-                    time.sleep(300)  # 每5分钟清理一次
-                except Exception as e:
-                    self.logger.error(f"缓存清理失败: {e}")
-                    
-        # 启动清理线程
-        cleanup_thread = threading.Thread(target=cleanup, daemon=True)
-        cleanup_thread.start()
+        """启动定期清理缓存的定时任务"""
+        # 每5分钟清理一次
+        self.engine.scheduler.call_every(300, self.clean_expired_cache, delay=0, jitter=0.1)
         
     def clean_expired_cache(self):
         """清理过期缓存"""
-        current_time = time.time()
-        expired_keys = []
-        
-        for key, (value, timestamp) in self.cache.items():
-            if current_time - timestamp > self.cache_expire_time:
-                expired_keys.append(key)
-                
-        # 删除过期缓存
-        for key in expired_keys:
-            del self.cache[key]
-            
-        self.logger.info(f"清理了 {len(expired_keys)} 条过期缓存")
+        expired_count = self.engine.clean_expired_cache()
+        self.logger.info(f"清理了 {expired_count} 条过期缓存")
         
     def start_network_monitor(self):
         """启动网络状态监控"""
-        def monitor():
-            while True:
-                try:
-                    self.check_network_status()
-                    time.sleep(60)  # 每分钟检查一次
-                except Exception as e:
-                    self.logger.error(f"网络状态检查失败: {e}")
-                    
-        # 启动监控线程
-        monitor_thread = threading.Thread(target=monitor, daemon=True)
-        monitor_thread.start()
+        # 网络状态由解析和检测请求的结果推断，没有请求时才主动访问测试站点，
+        # 状态变化时刷新状态栏
+        self.engine.network_health.add_listener(lambda online: self.ui.call(self.update_status_bar))
+        self.engine.network_health.start()
+        # 状态栏中的缓存和线路统计每分钟刷新一次
+        self.engine.scheduler.call_every(60, self.ui.call, self.update_status_bar, pause_when_idle=True)
         
-    def check_network_status(self):
-        """检查网络状态"""
-        try:
-            # 测试与常用网站的连接
-            test_urls = [
-                'https://www.baidu.com',
-                'https://www.qq.com',
-                'https://www.iqiyi.com'
-            ]
-            
-            for url in test_urls:
-                response = self.session.head(
-                    url,
-                    timeout=3,
-                    verify=False
-                )
-                if response.status_code == 200:
-                    self.network_status = {
-                        'status': True,
-                        'last_check': time.time()
-                    }
-                    self.update_status_bar()
-                    return True
-                    
-            raise Exception("所有测试站点均无法访问")
-            
-        except Exception as e:
-            self.network_status = {
-                'status': False,
-                'last_check': time.time(),
-                'error': str(e)
-            }
-            self.update_status_bar()
-            return False
-            
     def update_status_bar(self):
         """更新状态栏显示"""
         # 网络状态
-        if self.network_status['status']:
+        if self.engine.network_health.online:
             network_text = "网络正常 ✓"
             network_style = 'Status.Success.TLabel'
         else:
@@ -1776,20 +1774,21 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
             network_style = 'Status.Error.TLabel'
             
         # 缓存状态
-        cache_count = len(self.cache)
-        cache_percent = (cache_count / self.cache_limit) * 100
+        cache_count = len(self.engine.cache)
+        cache_percent = (cache_count / self.engine.cache.maxsize) * 100
         if cache_percent < 50:
             cache_style = 'Status.Success.TLabel'
         elif cache_percent < 80:
             cache_style = 'Status.Warning.TLabel'
         else:
             cache_style = 'Status.Error.TLabel'
-        cache_text = f"缓存: {cache_count}/{self.cache_limit}"
+        cache_text = f"缓存: {cache_count}/{self.engine.cache.maxsize}"
         
         # API性能
-        if self.api_performance:
-            best_api = max(self.api_performance.items(),
-                         key=lambda x: x[1]['success_rate'])
+        line_stats = [(name, self.engine.line_stats(name)) for name in self.engine.api_list]
+        line_stats = [(name, stats) for name, stats in line_stats if stats]
+        if line_stats:
+            best_api = max(line_stats, key=lambda x: x[1]['success_rate'])
             api_text = f"最佳线路: {best_api[0]} ({best_api[1]['success_rate']:.1f}%)"
         else:
             api_text = "暂无线路统计"
@@ -1799,71 +1798,13 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         self.status_var.set(status_text)
         
         # 根据状态设置样式
-        if not self.network_status['status']:
+        if not self.engine.network_health.online:
             self.status_bar.configure(style='Status.Error.TLabel')
         elif cache_percent >= 80:
             self.status_bar.configure(style='Status.Warning.TLabel')
         else:
             self.status_bar.configure(style='Status.TLabel')
         
-    def update_api_performance(self, api_name, response_time, success=True):
-        """更新API性能统计"""
-        if api_name not in self.api_performance:
-            self.api_performance[api_name] = {
-                'total_time': 0,
-                'count': 0,
-                'avg_time': 0,
-                'success_rate': 0,
-                'success_count': 0,
-                'fail_count': 0,
-                'last_test': 0,
-                'speed_test': []  # 存储最近的速度测试结果
-            }
-            
-        stats = self.api_performance[api_name]
-        stats['total_time'] += response_time
-        stats['count'] += 1
-        stats['avg_time'] = stats['total_time'] / stats['count']
-        
-        if success:
-            stats['success_count'] += 1
-        else:
-            stats['fail_count'] += 1
-            
-        stats['success_rate'] = (stats['success_count'] / 
-            (stats['success_count'] + stats['fail_count'])) * 100
-            
-        # 更新速度测试结果
-        stats['speed_test'].append(response_time)
-        if len(stats['speed_test']) > 5:  # 只保留最近5次测试结果
-            stats['speed_test'].pop(0)
-            
-        stats['last_test'] = time.time()
-        
-    def test_api_speed(self, api_name, api_url):
-        """测试单个API的速度"""
-        try:
-            test_url = "https://www.iqiyi.com/v_19rr1skq2c.html"
-            parse_url = api_url + test_url
-            
-            start_time = time.time()
-            response = self.session.head(
-                parse_url,
-                timeout=self.request_timeout,
-                allow_redirects=True,
-                verify=False
-            )
-            response_time = time.time() - start_time
-            
-            success = response.status_code == 200
-            self.update_api_performance(api_name, response_time, success)
-            
-            return success, response_time
-            
-        except Exception as e:
-            self.update_api_performance(api_name, self.request_timeout, False)
-            return False, self.request_timeout
-            
     def auto_test_api_speed(self):
         """自动测试所有API速度"""
         speed_test_window = tk.Toplevel(self.window)
@@ -1884,7 +1825,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         progress_var = tk.DoubleVar()
         progress_bar = ttk.Progressbar(main_frame,
                                      variable=progress_var,
-                                     maximum=len(self.api_list),
+                                     maximum=len(self.engine.api_list),
                                      length=700,  # 增加进度条长度
                                      mode='determinate')
         progress_bar.pack(pady=10)
@@ -1898,51 +1839,95 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         result_text.pack(fill=tk.BOTH, expand=True)
         
         def update_status(text):
-            result_text.insert(tk.END, text + "\n")
-            result_text.see(tk.END)
-            speed_test_window.update()
+            self.ui.append(result_text, text + "\n")
+        
+        # 关闭窗口时中断进行中的测速
+        test_state = {'token': CancelToken()}
+        
+        def close_speed_test():
+            test_state['token'].cancel()
+            speed_test_window.destroy()
+        
+        speed_test_window.protocol("WM_DELETE_WINDOW", close_speed_test)
         
         def run_speed_test():
+            token = test_state['token']
             try:
                 update_status("开始测速...")
-                results = []
                 
-                for i, (api_name, api_url) in enumerate(self.api_list.items()):
-                    update_status(f"\n测试 {api_name}...")
-                    success, response_time = self.test_api_speed(api_name, api_url)
-                    
-                    status = "✓ 可用" if success else "✗ 不可用"
-                    speed = f"{response_time:.2f}秒"
-                    update_status(f"状态: {status}")
-                    update_status(f"响应时间: {speed}")
-                    
-                    if success:
-                        results.append((api_name, response_time))
-                    
-                    progress_var.set(i + 1)
+                # 指向同一接口的线路只测一次，结果共用；熔断中的线路跳过
+                tested = 0
+                for names in self.engine.endpoint_groups().values():
+                    if self.engine.is_circuit_open(names[0]):
+                        update_status(f"{' / '.join(names)}: ✗ 连续失败，熔断中，已跳过")
+                        tested += len(names)
+                self.ui.set(progress_var, tested)
+                
+                def show_result(line):
+                    nonlocal tested
+                    tested += len(line.names)
+                    update_status(f"\n{' / '.join(line.names)}")
+                    if line.success:
+                        total = line.summary('total')
+                        update_status(f"状态: ✓ 可用（成功 {len(line.ok_samples)}/{len(line.samples) + len(line.errors)} 次）")
+                        update_status(f"总耗时: 最小 {total['min']:.2f}秒 / 中位 {total['median']:.2f}秒 / "
+                                      f"p95 {total['p95']:.2f}秒 / 抖动 {total['jitter']:.2f}秒")
+                        phases = [f"{label} {summary['median'] * 1000:.0f}ms"
+                                  for label, summary in (('DNS', line.summary('dns')),
+                                                         ('连接', line.summary('connect')),
+                                                         ('TLS', line.summary('tls')),
+                                                         ('首字节', line.summary('ttfb')))
+                                  if summary is not None]
+                        update_status("阶段中位数: " + "，".join(phases))
+                    else:
+                        reason = line.errors[-1] if line.errors else f"HTTP {line.samples[-1]['status']}"
+                        update_status(f"状态: ✗ 不可用（{reason}）")
+                    connect_timeout, read_timeout = self.engine.line_timeouts(line.names[0])
+                    update_status(f"超时设置: 连接 {connect_timeout:.1f}秒 / 读取 {read_timeout:.1f}秒")
+                    self.ui.set(progress_var, tested)
+                
+                speeds = self.engine.run_speed_test(token=token, on_result=show_result)
                 
-                # 根据速度排序
+                # 按总耗时中位数排序
+                results = sorted((line for line in speeds if line.success),
+                                 key=lambda line: line.summary('total')['median'])
                 if results:
-                    results.sort(key=lambda x: x[1])
                     update_status("\n\n测速结果排名:")
-                    for i, (api_name, response_time) in enumerate(results, 1):
-                        update_status(f"{i}. {api_name} - {response_time:.2f}秒")
+                    for i, line in enumerate(results, 1):
+                        total = line.summary('total')
+                        update_status(f"{i}. {' / '.join(line.names)} - {total['median']:.2f}秒"
+                                      f"（p95 {total['p95']:.2f}秒，抖动 {total['jitter']:.2f}秒）")
                     
                     # 自动选择最快的线路
-                    best_api = results[0][0]
-                    self.api_var.set(best_api)
+                    best_api = results[0].names[0]
+                    self.ui.set(self.api_var, best_api)
                     update_status(f"\n已自动选择最快线路: {best_api}")
                     
                     # 优化API顺序
-                    self.optimize_api_order()
+                    self.ui.call(self.optimize_api_order)
+                
+                # 新建连接与复用连接的响应时间对比
+                latency = self.engine.connection_latency()
+                lines = [f"{label}: {avg:.2f}秒（{count}次）"
+                         for label, (avg, count) in (('冷连接', latency['cold']),
+                                                     ('热连接', latency['warm']))
+                         if count]
+                if lines:
+                    update_status("\n连接耗时 - " + "，".join(lines))
+                dns_hit_rate = self.engine.dns_cache.hit_rate() if self.engine.dns_cache else None
+                if dns_hit_rate is not None:
+                    update_status(f"DNS缓存命中率: {dns_hit_rate:.0%}")
                 
                 update_status("\n测速完成！")
                 
+            except Cancelled:
+                pass  # 窗口已关闭
             except Exception as e:
                 update_status(f"\n测速过程出错: {str(e)}")
             
             finally:
-                test_btn.configure(state='normal')
+                if not token.cancelled:
+                    self.ui.call(test_btn.configure, state='normal')
         
         # 底部按钮框架
         btn_frame = ttk.Frame(main_frame)
@@ -1956,7 +1941,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
             test_btn.configure(state='disabled')
             progress_var.set(0)
             result_text.delete(1.0, tk.END)
-            threading.Thread(target=run_speed_test, daemon=True).start()
+            self.engine.thread_pool.submit(run_speed_test)
         
         # 统一按钮样式
         button_style = {
@@ -1976,7 +1961,7 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
         
         ttk.Button(right_btn_frame,
                 text="关闭",
-                command=speed_test_window.destroy,
+                command=close_speed_test,
                 **button_style).pack(side=tk.RIGHT)
         
         # 使窗口居中
@@ -1989,39 +1974,13 @@ A: 解析速度取决于网络状况和服务器负载，建议耐心等待或
 
     def optimize_api_order(self):
         """优化API顺序"""
-        if not self.api_performance:
-            return
-            
-        # 根据性能统计重新排序API列表
-        sorted_apis = sorted(
-            self.api_list.items(),
-            key=lambda x: (
-                self.api_performance.get(x[0], {}).get('success_rate', 0),
-                -self.api_performance.get(x[0], {}).get('avg_time', float('inf')),
-                -len(self.api_performance.get(x[0], {}).get('speed_test', [])),
-                -self.api_performance.get(x[0], {}).get('last_test', 0)
-            ),
-            reverse=True
-        )
-        
-        # 更新API列表
-        self.api_list = dict(sorted_apis)
-        # 更新界面
-        self.update_api_radio_buttons()
+        if self.engine.optimize_api_order():
+            # 更新界面
+            self.update_api_radio_buttons()
 
-    def get_best_api(self):
-        """获取性能最好的API"""
-        if not self.api_performance:
-            return None
-            
-        # 根据平均响应时间和成功率排序
-        sorted_apis = sorted(
-            self.api_performance.items(),
-            key=lambda x: (x[1]['success_rate'], -x[1]['avg_time']),
-            reverse=True
-        )
-        
-        return sorted_apis[0][0] if sorted_apis else None
+    def get_best_api(self, platform=None):
+        """获取性能最好的API，可指定视频所属平台"""
+        return self.engine.get_best_api(platform)
 
 
 if __name__ == '__main__':
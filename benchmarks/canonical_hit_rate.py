@@ -0,0 +1,102 @@
+"""对比原始链接与归一化链接作为缓存键时的命中率
+
+用法: python benchmarks/canonical_hit_rate.py [访问次数]
+
+按各平台真实的链接形态生成视频集合，每次访问随机加上跟踪参数、锚点
+或换成移动端域名，模拟用户从不同入口复制链接，然后分别用原始链接和
+canonical_key 作为键在同样容量的 LRU 缓存中统计命中率，以及命中了
+另一个视频的缓存（误命中）的次数。
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_cache import TTLCache  # noqa: E402
+from video_platforms import canonical_key  # noqa: E402
+
+
+def _random_id(rng, alphabet, length):
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+def build_videos(rng, per_platform=40):
+    """生成各平台的视频，每个视频包含若干种等价链接写法"""
+    lower = 'abcdefghijklmnopqrstuvwxyz0123456789'
+    mixed = lower + 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    videos = []
+    for _ in range(per_platform):
+        vid = 'v_' + _random_id(rng, lower, 10)
+        videos.append([f'https://www.iqiyi.com/{vid}.html', f'https://m.iqiyi.com/{vid}.html'])
+
+        cid, qvid = _random_id(rng, lower, 15), _random_id(rng, lower, 11)
+        videos.append([f'https://v.qq.com/x/cover/{cid}/{qvid}.html',
+                       f'https://m.v.qq.com/x/cover/{cid}/{qvid}.html',
+                       f'https://m.v.qq.com/x/m/play?cid={cid}&vid={qvid}'])
+
+        yid = 'X' + _random_id(rng, mixed, 14)
+        videos.append([f'https://v.youku.com/v_show/id_{yid}==.html',
+                       f'https://m.youku.com/alipay_video/id_{yid}==.html'])
+
+        mid = f'{rng.randint(100000, 999999)}/{rng.randint(10000000, 99999999)}'
+        videos.append([f'https://www.mgtv.com/b/{mid}.html', f'https://m.mgtv.com/b/{mid}.html'])
+
+        bvid = 'BV1' + _random_id(rng, mixed, 9)
+        videos.append([f'https://www.bilibili.com/video/{bvid}',
+                       f'https://www.bilibili.com/video/{bvid}/',
+                       f'https://m.bilibili.com/video/{bvid}'])
+
+        fid = rng.randint(1000, 999999)
+        videos.append([f'https://www.1905.com/vod/play/{fid}.shtml',
+                       f'https://vip.1905.com/play/{fid}.shtml'])
+
+        # 没有专门规则、靠参数区分视频的链接
+        fbvid = 'BV1' + _random_id(rng, mixed, 9)
+        videos.append([f'https://www.bilibili.com/festival/2021bnj?bvid={fbvid}'])
+        uvid = _random_id(rng, mixed, 12)
+        videos.append([f'https://v.youku.com/video?vid={uvid}'])
+    return videos
+
+
+TRACKING_PARAMS = ['spm', 'vfrm', 'share_source', 'ptag', 'fpa', 'from', 'vd_source', 'frp']
+
+
+def decorate(rng, url):
+    """随机加上跟踪参数和锚点"""
+    params = rng.sample(TRACKING_PARAMS, rng.randint(0, 3))
+    if params:
+        query = '&'.join(f'{name}={_random_id(rng, "abcdef0123456789", 8)}' for name in params)
+        url += ('&' if '?' in url else '?') + query
+    if rng.random() < 0.2:
+        url += '#curid=' + _random_id(rng, '0123456789', 6)
+    return url
+
+
+def run(visits=20000, cache_size=100, seed=2024):
+    rng = random.Random(seed)
+    videos = build_videos(rng)
+    # 热门视频被访问得更多
+    weights = [1 / (rank + 1) for rank in range(len(videos))]
+
+    raw_cache = TTLCache(maxsize=cache_size, ttl=3600)
+    canonical_cache = TTLCache(maxsize=cache_size, ttl=3600)
+    false_hits = {id(raw_cache): 0, id(canonical_cache): 0}
+    for index in rng.choices(range(len(videos)), weights=weights, k=visits):
+        url = decorate(rng, rng.choice(videos[index]))
+        for cache, key in ((raw_cache, url), (canonical_cache, canonical_key(url))):
+            cached = cache.get(key)
+            if cached is None:
+                cache.put(key, index)
+            elif cached != index:
+                false_hits[id(cache)] += 1
+
+    print(f"视频数: {len(videos)}  访问次数: {visits}  缓存容量: {cache_size}")
+    for name, cache in (('原始链接', raw_cache), ('归一化链接', canonical_cache)):
+        hits = cache.metrics['cache_hits']
+        print(f"{name}: 命中 {hits} 次，命中率 {hits / visits:.1%}，"
+              f"误命中 {false_hits[id(cache)]} 次")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,99 @@
+"""用合成的延迟序列回放 LineRanker 的线路选择
+
+用法: python benchmarks/line_ranker_replay.py [时长（小时）]
+
+模拟几条表现不同的线路：稳定的快线路、较慢的线路、一直不可用的线路，
+以及一条开始时不可用、中途恢复且恢复后最快的线路。用注入的时钟和随机数
+每隔固定时间选一条线路发请求并记录结果，分别统计汤普森采样（select）和
+只按期望得分选择（rank 的第一条）时：多久收敛到最快的可用线路、恢复的线路
+多久被重新发现并成为首选，以及各阶段请求落在最快可用线路上的比例。
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from line_ranker import LineRanker  # noqa: E402
+
+STEP = 30  # 两次请求的间隔（秒）
+RECOVER_AT = 3 * 3600  # 恢复线路开始可用的时间（秒）
+WINDOW = 10  # 判断是否成为首选的滑动窗口（次）
+
+
+def line_profiles():
+    """线路名称 -> (可用性函数, 平均响应时间, 成功率)"""
+    # 最快的线路不放在第一位，避免得分相同时靠列表顺序选中
+    return {
+        '失效线路': (lambda t: False, 0, 0),
+        '慢线路': (lambda t: True, 1.2, 0.9),
+        '恢复线路': (lambda t: t >= RECOVER_AT, 0.2, 0.98),
+        '不稳定线路': (lambda t: True, 0.6, 0.5),
+        '快线路': (lambda t: True, 0.4, 0.95),
+    }
+
+
+def best_line(t):
+    return '恢复线路' if t >= RECOVER_AT else '快线路'
+
+
+def simulate(explore, hours, seed=2024):
+    """回放一次，返回每次请求的 (时间, 选中的线路)"""
+    now = [0.0]
+    trace_rng = random.Random(seed)
+    ranker = LineRanker(clock=lambda: now[0], rng=random.Random(seed + 1))
+    profiles = line_profiles()
+    names = list(profiles)
+    picks = []
+    while now[0] < hours * 3600:
+        t = now[0]
+        name = ranker.select(names) if explore else ranker.rank(names)[0]
+        available, latency, success_rate = profiles[name]
+        if available(t) and trace_rng.random() < success_rate:
+            ranker.record(name, latency * trace_rng.lognormvariate(0, 0.3), True)
+        else:
+            ranker.record(name, 8.0, False)  # 失败按超时计
+        picks.append((t, name))
+        now[0] += STEP
+    return picks
+
+
+def takeover_time(picks, start, line):
+    """start 之后该线路在滑动窗口内占多数的最早时间，没有时返回None"""
+    recent = []
+    for t, name in picks:
+        if t < start:
+            continue
+        recent.append(name == line)
+        if len(recent) > WINDOW:
+            recent.pop(0)
+        if len(recent) == WINDOW and sum(recent) * 2 > WINDOW:
+            return t - start
+    return None
+
+
+def summarize(label, picks):
+    first_try = next((t - RECOVER_AT for t, name in picks
+                      if t >= RECOVER_AT and name == '恢复线路'), None)
+    converge = takeover_time(picks, 0, '快线路')
+    rediscover = takeover_time(picks, RECOVER_AT, '恢复线路')
+    before = [name == best_line(t) for t, name in picks if t < RECOVER_AT]
+    after = [name == best_line(t) for t, name in picks if t >= RECOVER_AT]
+
+    def fmt(seconds):
+        return '未发生' if seconds is None else f'{seconds / 60:.1f} 分钟'
+
+    print(f"{label}:")
+    print(f"  收敛到快线路: {fmt(converge)}，恢复前选中最快可用线路 {sum(before) / len(before):.1%}")
+    print(f"  恢复后首次尝试恢复线路: {fmt(first_try)}，成为首选: {fmt(rediscover)}，"
+          f"恢复后选中最快可用线路 {sum(after) / max(len(after), 1):.1%}")
+
+
+def run(hours=6):
+    print(f"时长: {hours} 小时  请求间隔: {STEP} 秒  恢复线路在第 {RECOVER_AT // 3600} 小时恢复")
+    summarize('汤普森采样', simulate(True, hours))
+    summarize('只按期望得分', simulate(False, hours))
+
+
+if __name__ == '__main__':
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 6)
@@ -0,0 +1,91 @@
+"""对比旧的子串扫描与后缀索引两种链接校验方式
+
+用法: python benchmarks/platform_index.py [链接数量]
+
+生成包含各平台正常链接、移动端链接、其他网站链接和伪装域名
+（如 notiqiyi.com.evil）的链接集合，分别计时并统计两种方式判断不一致的链接。
+"""
+import os
+import random
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parse_engine import ParseEngine  # noqa: E402
+from video_platforms import match_platform  # noqa: E402
+
+
+def legacy_validate_url(url):
+    """改动前 validate_url 的实现：每次新建域名列表并做子串匹配"""
+    valid_domains = [
+        'iqiyi.com', 'v.qq.com', 'youku.com', 'mgtv.com',
+        'bilibili.com', 'tv.sohu.com', 'pptv.com', '1905.com'
+    ]
+    try:
+        result = urlparse(url)
+        return all([
+            result.scheme in ['http', 'https'],
+            any(domain in result.netloc.lower() for domain in valid_domains)
+        ])
+    except:
+        return False
+
+
+def legacy_match_host(host):
+    """改动前的主机匹配部分，单独计时用"""
+    valid_domains = [
+        'iqiyi.com', 'v.qq.com', 'youku.com', 'mgtv.com',
+        'bilibili.com', 'tv.sohu.com', 'pptv.com', '1905.com'
+    ]
+    return any(domain in host.lower() for domain in valid_domains)
+
+
+HOSTS = [
+    'www.iqiyi.com', 'm.iqiyi.com', 'v.qq.com', 'm.v.qq.com', 'v.youku.com',
+    'www.mgtv.com', 'www.bilibili.com', 'tv.sohu.com', 'v.pptv.com', 'www.1905.com',
+    'www.example.com', 'news.qq.com', 'cdn.jsdelivr.net', 'github.com',
+    'notiqiyi.com.evil', 'v.qq.com.phish.cn', 'youku.com-login.top',
+]
+
+
+def build_urls(count, seed=2024):
+    rng = random.Random(seed)
+    urls = []
+    for _ in range(count):
+        host = rng.choice(HOSTS)
+        scheme = rng.choice(('https', 'https', 'http', 'ftp'))
+        urls.append(f'{scheme}://{host}/v_{rng.randrange(16 ** 8):08x}.html?spm={rng.randrange(1000)}')
+    return urls
+
+
+def timed(func, urls):
+    start = time.perf_counter()
+    results = [func(url) for url in urls]
+    return time.perf_counter() - start, results
+
+
+def run(count=100000):
+    urls = build_urls(count)
+    engine = ParseEngine()
+    try:
+        legacy_time, legacy = timed(legacy_validate_url, urls)
+        index_time, indexed = timed(engine.validate_url, urls)
+    finally:
+        engine.close()
+    hosts = [urlparse(url).hostname for url in urls]
+    legacy_host_time, _ = timed(legacy_match_host, hosts)
+    index_host_time, _ = timed(match_platform, hosts)
+
+    disagreements = [url for url, old, new in zip(urls, legacy, indexed) if bool(old) != bool(new)]
+    print(f"链接数: {count}")
+    print(f"子串扫描: {legacy_time:.3f}s ({legacy_time / count * 1e6:.2f}us/个)，通过 {sum(map(bool, legacy))}")
+    print(f"后缀索引: {index_time:.3f}s ({index_time / count * 1e6:.2f}us/个)，通过 {sum(map(bool, indexed))}")
+    print(f"仅主机匹配: 子串扫描 {legacy_host_time:.3f}s，后缀索引 {index_host_time:.3f}s")
+    print(f"判断不一致: {len(disagreements)}，涉及主机: "
+          f"{sorted({urlparse(url).hostname for url in disagreements})}")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
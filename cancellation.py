@@ -0,0 +1,290 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+import urllib3.connection
+import urllib3.util.connection
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+
+from dns_cache import is_ip_address
+
+
+class Cancelled(Exception):
+    """操作已被取消"""
+
+
+class CancelToken:
+    """取消令牌
+
+    由发起操作的一方持有并调用 cancel()，执行操作的各层检查 cancelled
+    或注册回调。回调在 cancel() 的调用线程中立即执行，用于中断正在
+    阻塞的请求；令牌已取消时注册的回调会被立即调用。
+    """
+
+    def __init__(self):
+        """初始化"""
+        self._event = threading.Event()
+        self._callbacks = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        """是否已取消"""
+        return self._event.is_set()
+
+    def cancel(self):
+        """取消操作并执行已注册的回调"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def child(self):
+        """返回子令牌：本令牌取消时子令牌随之取消，子令牌也可以单独取消
+
+        用于一组检测（竞速、对冲）在得到结果后中断其余的检测，而不影响调用方的令牌。
+        """
+        child = CancelToken()
+        handle = self.on_cancel(child.cancel)
+        if handle is not None:
+            # 子令牌取消后不再留在本令牌的回调里，批量操作中不会越积越多
+            child.on_cancel(lambda: self.remove(handle))
+        return child
+
+    def raise_if_cancelled(self):
+        """已取消时抛出 Cancelled"""
+        if self._event.is_set():
+            raise Cancelled("操作已取消")
+
+    def wait(self, timeout):
+        """最多等待 timeout 秒，期间被取消时提前返回True"""
+        return self._event.wait(timeout)
+
+    def wait_for(self, future):
+        """等待 future 完成并返回其结果，期间被取消时立即抛出 Cancelled"""
+        done = threading.Event()
+        future.add_done_callback(lambda _: done.set())
+        handle = self.on_cancel(done.set)
+        try:
+            done.wait()
+        finally:
+            if handle is not None:
+                self.remove(handle)
+        if not future.done():
+            raise Cancelled("操作已取消")
+        return future.result()
+
+    def on_cancel(self, callback):
+        """注册取消时执行的回调，返回用于 remove() 的句柄"""
+        with self._lock:
+            if not self._event.is_set():
+                handle = self._next_id
+                self._next_id += 1
+                self._callbacks[handle] = callback
+                return handle
+        callback()
+        return None
+
+    def remove(self, handle):
+        """注销回调"""
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+
+_local = threading.local()
+
+
+def current_token():
+    """当前线程正在执行的请求所属的取消令牌"""
+    return getattr(_local, 'token', None)
+
+
+@contextmanager
+def bind(token):
+    """在 with 块内把令牌绑定到当前线程，块内新发出的请求可被它中断"""
+    previous = current_token()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+@contextmanager
+def record_connects():
+    """在 with 块内记录当前线程新建连接的耗时（含TLS握手），产出耗时列表"""
+    previous = getattr(_local, 'connect_times', None)
+    _local.connect_times = times = []
+    try:
+        yield times
+    finally:
+        _local.connect_times = previous
+
+
+_exposed_lock = threading.Lock()
+
+
+class _CancellableConnectionMixin:
+    """连接期间和请求期间把连接登记到当前线程的取消令牌，取消时关闭套接字使阻塞的操作立即返回
+
+    建立连接时在 connect 之前登记套接字的副本，TCP连接和TLS握手阻塞时也能被中断
+    （握手会接管原套接字对象，副本指向同一个连接，仍然可以关闭）。
+    新建连接的耗时记录到 record_connects() 产出的列表中。
+    类属性 dns_cache 不为None时，主机名通过它解析。
+    """
+
+    dns_cache = None
+    _exposed = None  # 正在建立的连接的套接字副本
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            if self.dns_cache is not None and not is_ip_address(host):
+                addresses = self.dns_cache.resolve(host)
+            else:
+                addresses = socket.getaddrinfo(host.strip('[]'), self.port,
+                                               urllib3.util.connection.allowed_gai_family(),
+                                               socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+
+        # 与 urllib3 相同，依次尝试解析到的各个地址
+        error = None
+        for family, socktype, proto, _, sockaddr in addresses:
+            try:
+                return self._connect_to(family, socktype, proto,
+                                        (sockaddr[0], self.port) + tuple(sockaddr[2:]))
+            except socket.timeout:
+                error = ConnectTimeoutError(
+                    self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+                )
+            except OSError as e:
+                error = NewConnectionError(self, f"Failed to establish a new connection: {e}")
+        raise error or NewConnectionError(self, f"无法连接到 {self.host}")
+
+    def _connect_to(self, family, socktype, proto, address):
+        """新建套接字并连接到 address，连接前登记副本以便取消"""
+        sock = socket.socket(family, socktype, proto)
+        try:
+            for option in self.socket_options or ():
+                sock.setsockopt(*option)
+            if self.timeout is not _DEFAULT_TIMEOUT:
+                sock.settimeout(self.timeout)
+            if self.source_address:
+                sock.bind(self.source_address)
+            self._expose(sock)
+            sock.connect(address)
+            return sock
+        except BaseException:
+            sock.close()
+            raise
+
+    def _expose(self, sock):
+        """登记正在建立的套接字；令牌已被取消时抛出 Cancelled"""
+        duplicate = sock.dup()
+        with _exposed_lock:
+            previous, self._exposed = self._exposed, duplicate
+        if previous is not None:
+            previous.close()
+        token = current_token()
+        if token is not None:
+            token.raise_if_cancelled()  # 登记之前已取消的，_abort 没能关闭它
+
+    def _release_exposed(self):
+        with _exposed_lock:
+            exposed, self._exposed = self._exposed, None
+        if exposed is not None:
+            exposed.close()
+
+    def connect(self):
+        token = current_token()
+        handle = None
+        if token is not None:
+            token.raise_if_cancelled()
+            handle = token.on_cancel(self._abort)
+        start_time = time.monotonic()
+        try:
+            super().connect()
+        finally:
+            if handle is not None:
+                token.remove(handle)
+            self._release_exposed()
+        times = getattr(_local, 'connect_times', None)
+        if times is not None:
+            times.append(time.monotonic() - start_time)
+
+    def request(self, *args, **kwargs):
+        token = current_token()
+        if token is not None:
+            token.raise_if_cancelled()
+            self._cancel_handle = (token, token.on_cancel(self._abort))
+        try:
+            super().request(*args, **kwargs)
+        except BaseException:
+            self._unregister()
+            raise
+
+    def getresponse(self, *args, **kwargs):
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            self._unregister()
+
+    def _unregister(self):
+        registration = getattr(self, '_cancel_handle', None)
+        if registration is not None:
+            token, handle = registration
+            token.remove(handle)
+            self._cancel_handle = None
+
+    def _abort(self):
+        with _exposed_lock:
+            for sock in (self.sock, self._exposed):
+                if sock is not None:
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+
+class CancellableHTTPConnection(_CancellableConnectionMixin, urllib3.connection.HTTPConnection):
+    pass
+
+
+class CancellableHTTPSConnection(_CancellableConnectionMixin, urllib3.connection.HTTPSConnection):
+    pass
+
+
+class CancellableHTTPAdapter(requests.adapters.HTTPAdapter):
+    """连接可被取消令牌中断的 HTTPAdapter
+
+    被中断的连接由 urllib3 关闭并丢弃，不会带着未读完的响应回到连接池。
+    传入 dns_cache（dns_cache.DNSCache）时，经该适配器新建的连接通过它
+    解析主机名，只对挂载了该适配器的会话生效。
+    """
+
+    def __init__(self, *args, dns_cache=None, **kwargs):
+        self.dns_cache = dns_cache  # 父类初始化时就会调用 init_poolmanager
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pool_classes = dict(self.poolmanager.pool_classes_by_scheme)
+        for scheme, connection_cls in (('http', CancellableHTTPConnection),
+                                       ('https', CancellableHTTPSConnection)):
+            if self.dns_cache is not None:
+                connection_cls = type(connection_cls.__name__, (connection_cls,),
+                                      {'dns_cache': self.dns_cache})
+            pool_cls = pool_classes[scheme]
+            pool_classes[scheme] = type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': connection_cls})
+        self.poolmanager.pool_classes_by_scheme = pool_classes
@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+# 熔断器状态
+CLOSED = 'closed'  # 正常放行
+OPEN = 'open'  # 熔断中，直接拒绝
+HALF_OPEN = 'half_open'  # 冷却结束，放行一次试探请求
+
+
+class CircuitBreaker:
+    """单条解析线路的熔断器
+
+    连续失败达到 failure_threshold 次后熔断，冷却 cooldown 秒内的请求直接失败；
+    冷却结束后放行一次试探请求，成功则恢复，失败则重新熔断。
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=60, clock=time.time):
+        """初始化熔断器"""
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0  # 连续失败次数
+        self.opened_at = 0  # 最近一次熔断的时间
+        self.trial_started = 0  # 半开状态下试探请求的开始时间
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """判断是否放行本次请求"""
+        with self._lock:
+            now = self.clock()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now - self.opened_at < self.cooldown:
+                    return False
+                self.state = HALF_OPEN
+                self.trial_started = now
+                return True
+            # 半开状态只放行一个试探请求，试探结果迟迟不来时允许重新试探
+            if now - self.trial_started >= self.cooldown:
+                self.trial_started = now
+                return True
+            return False
+
+    def is_open(self):
+        """是否处于熔断冷却期（不改变状态）"""
+        with self._lock:
+            return self.state == OPEN and self.clock() - self.opened_at < self.cooldown
+
+    def record_success(self):
+        """记录一次成功"""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        """记录一次失败"""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+    def record_cancelled(self):
+        """请求被取消，不计成败；半开状态下允许立即重新试探"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.trial_started = 0
+
+    def to_dict(self):
+        """导出状态，用于持久化"""
+        with self._lock:
+            # 半开状态的试探结果不会被保存，恢复后按熔断处理，冷却结束再试探
+            state = OPEN if self.state == HALF_OPEN else self.state
+            return {'state': state, 'failures': self.failures, 'opened_at': self.opened_at}
+
+    def restore(self, data):
+        """从持久化数据恢复状态"""
+        with self._lock:
+            self.state = data.get('state', CLOSED)
+            self.failures = data.get('failures', 0)
+            self.opened_at = data.get('opened_at', 0)
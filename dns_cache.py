@@ -0,0 +1,108 @@
+import ipaddress
+import logging
+import socket
+import threading
+import time
+
+from result_cache import TTLCache
+from singleflight import SingleFlight
+
+
+def is_ip_address(host):
+    """主机名是否本身就是IP地址（IPv6 可带方括号）"""
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+    except ValueError:
+        return False
+    return True
+
+
+class DNSCache:
+    """进程内的域名解析缓存
+
+    解析结果按 ttl 缓存，解析失败按较短的 negative_ttl 缓存，同一域名
+    同时发起的解析只查询一次。传给 cancellation.CancellableHTTPAdapter 后，
+    挂载了该适配器的会话新建连接时通过这里解析主机名，不影响进程内的其他
+    连接；prefetch() 可在后台提前解析并定时刷新常用主机，
+    使缓存在用户请求前就是热的。命中、未命中等次数写入 metrics
+    （键名以 dns_ 开头）。
+    """
+
+    def __init__(self, ttl=300, negative_ttl=30, maxsize=256, metrics=None,
+                 resolver=socket.getaddrinfo, clock=time.time):
+        """初始化缓存"""
+        self.ttl = ttl  # 解析结果缓存时间（秒）
+        self.negative_ttl = negative_ttl  # 解析失败的缓存时间（秒）
+        self.resolver = resolver
+        self.logger = logging.getLogger('VIPParser')
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, metrics_prefix='dns_', clock=clock)
+        self._flight = SingleFlight(metrics_name='dns_coalesced')
+        self.bind_metrics(metrics if metrics is not None else {})
+        self._prefetch_job = None
+        self._lock = threading.Lock()
+
+    def bind_metrics(self, metrics):
+        """把命中统计写入指定的字典"""
+        for name in ('hits', 'misses', 'evictions', 'expirations', 'coalesced', 'prefetches'):
+            metrics.setdefault('dns_' + name, 0)
+        self.metrics = self._cache.metrics = self._flight.metrics = metrics
+
+    def _lookup(self, host):
+        """查询系统解析器并写入缓存，失败时缓存异常"""
+        try:
+            addresses = self.resolver(host, None, 0, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            self._cache.put(host, e, ttl=self.negative_ttl)
+            raise
+        self._cache.put(host, addresses)
+        return addresses
+
+    def resolve(self, host):
+        """返回主机名的解析结果（getaddrinfo 格式），解析失败时抛出 socket.gaierror"""
+        host = host.lower().rstrip('.')
+        cached = self._cache.get(host)
+        if cached is None:
+            return self._flight.do(host, self._lookup, host)
+        if isinstance(cached, Exception):
+            raise socket.gaierror(*cached.args)
+        return cached
+
+    def hit_rate(self):
+        """缓存命中率，没有查询时返回None"""
+        total = self.metrics['dns_hits'] + self.metrics['dns_misses']
+        return self.metrics['dns_hits'] / total if total else None
+
+    def prefetch(self, hosts):
+        """立即重新解析这些主机并刷新缓存，返回成功解析的数量"""
+        resolved = 0
+        for host in hosts:
+            host = host.lower().rstrip('.')
+            try:
+                self._flight.do(host, self._lookup, host)
+                resolved += 1
+            except socket.gaierror:
+                continue
+            except Exception as e:
+                self.logger.debug(f"预解析 {host} 失败: {e}")
+        self.metrics['dns_prefetches'] += resolved
+        return resolved
+
+    def start_prefetch(self, scheduler, hosts, interval=None):
+        """在后台定时预解析，hosts 为返回主机名列表的无参函数
+
+        由 scheduler（scheduler.Scheduler）立即执行第一次，之后默认在缓存
+        过期前（ttl 的八成）刷新一次，用户空闲时暂停。
+        """
+        with self._lock:
+            if self._prefetch_job is None:
+                self._prefetch_job = scheduler.call_every(
+                    interval or self.ttl * 0.8, lambda: self.prefetch(hosts()),
+                    delay=0, pause_when_idle=True
+                )
+
+    def stop_prefetch(self):
+        """停止后台预解析"""
+        with self._lock:
+            if self._prefetch_job is not None:
+                self._prefetch_job.cancel()
+                self._prefetch_job = None
@@ -0,0 +1,129 @@
+import collections
+import logging
+import random
+import threading
+import time
+
+
+class HealthScheduler:
+    """后台定时检测线路健康状况
+
+    每条线路按重要程度决定检测间隔：importance 为1（排名最前）时间隔为
+    min_interval，为0时为 max_interval，中间线性取值，并加上 ±jitter 比例的
+    随机抖动，避免多条线路同时到期。启动时各线路的首次检测在 min_interval
+    内错开。到期的线路按过期程度（已过去的时间 / 检测间隔）从高到低检测，
+    任意60秒内发出的检测不超过 budget_per_minute 次，超出预算的留到下一轮。
+    线路最近被其他途径（解析、测速、手动检测）检测过时，按那次时间顺延。
+    检测只更新线路状态和统计，不修改线路列表。
+    """
+
+    def __init__(self, probe, targets, scheduler, last_checked=None, budget_per_minute=6,
+                 min_interval=120, max_interval=1800, jitter=0.2, tick=5,
+                 metrics=None, rng=None, clock=time.time):
+        """初始化
+
+        probe(线路) 执行一次检测；targets 为无参函数，返回 [(线路, 重要程度)]，
+        重要程度在0到1之间；scheduler 为执行定时检测的 scheduler.Scheduler，
+        用户空闲时暂停检测；last_checked(线路) 返回该线路最近一次检测的时间，
+        没有时返回None。
+        """
+        self.probe = probe
+        self.targets = targets
+        self.scheduler = scheduler
+        self.last_checked = last_checked
+        self.budget_per_minute = budget_per_minute  # 每分钟最多检测次数
+        self.min_interval = min_interval  # 最重要线路的检测间隔（秒）
+        self.max_interval = max_interval  # 最不重要线路的检测间隔（秒）
+        self.jitter = jitter  # 检测间隔的随机抖动比例
+        self.tick = tick  # 检查到期线路的间隔（秒）
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.logger = logging.getLogger('VIPParser')
+        self.metrics = metrics if metrics is not None else {}
+        self.metrics.setdefault('health_probes', 0)
+        self.metrics.setdefault('health_probes_deferred', 0)
+        self._next_due = {}  # 线路 -> 下次检测时间
+        self._seen = {}  # 线路 -> 已经计入排期的最近一次检测时间
+        self._sent = collections.deque()  # 最近60秒内发出检测的时间
+        self._lock = threading.Lock()
+        self._job = None
+
+    def interval(self, importance):
+        """重要程度对应的检测间隔（不含抖动）"""
+        importance = min(1.0, max(0.0, importance))
+        return self.max_interval - (self.max_interval - self.min_interval) * importance
+
+    def _jittered(self, interval):
+        return interval * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def due(self, now=None):
+        """返回当前到期的线路，按过期程度从高到低排序"""
+        now = self.clock() if now is None else now
+        targets = list(self.targets())
+        with self._lock:
+            current = {name for name, _ in targets}
+            for name in list(self._next_due):
+                if name not in current:
+                    del self._next_due[name]
+                    self._seen.pop(name, None)
+            overdue = []
+            for name, importance in targets:
+                interval = self.interval(importance)
+                if name not in self._next_due:
+                    self._next_due[name] = now + self.rng.uniform(0, self.min_interval)
+                if self.last_checked is not None:
+                    checked = self.last_checked(name)
+                    if checked and checked > self._seen.get(name, 0):
+                        self._seen[name] = checked
+                        self._next_due[name] = max(self._next_due[name],
+                                                   checked + self._jittered(interval))
+                if self._next_due[name] <= now:
+                    staleness = (now - self._next_due[name] + interval) / interval
+                    overdue.append((staleness, name, interval))
+        overdue.sort(key=lambda item: item[0], reverse=True)
+        return [(name, interval) for _, name, interval in overdue]
+
+    def _take_budget(self, now):
+        """占用一次检测预算，预算用完时返回False"""
+        with self._lock:
+            while self._sent and now - self._sent[0] >= 60:
+                self._sent.popleft()
+            if len(self._sent) >= self.budget_per_minute:
+                return False
+            self._sent.append(now)
+            return True
+
+    def run_once(self):
+        """检测一轮到期的线路，返回本轮检测的线路数"""
+        probed = 0
+        due = self.due()
+        for i, (name, interval) in enumerate(due):
+            now = self.clock()
+            if not self._take_budget(now):
+                self.metrics['health_probes_deferred'] += len(due) - i
+                break
+            with self._lock:
+                self._next_due[name] = now + self._jittered(interval)
+            try:
+                self.probe(name)
+            except Exception as e:
+                self.logger.debug(f"后台检测 {name} 失败: {e}")
+            with self._lock:
+                self._seen[name] = self.clock()  # 本次检测写入的时间不再顺延排期
+            self.metrics['health_probes'] += 1
+            probed += 1
+        return probed
+
+    def start(self):
+        """在后台开始定时检测"""
+        with self._lock:
+            if self._job is None:
+                self._job = self.scheduler.call_every(self.tick, self.run_once, delay=0,
+                                                      pause_when_idle=True)
+
+    def stop(self):
+        """停止检测"""
+        with self._lock:
+            if self._job is not None:
+                self._job.cancel()
+                self._job = None
@@ -0,0 +1,86 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+
+class HealthStore:
+    """线路健康数据的本地存储
+
+    数据保存在 SQLite 中，每条线路一行 JSON。写入先记在内存里，
+    flush_delay 秒内的多次更新合并成一次事务写盘，关闭时再写一次。
+    延时写盘由 bind_scheduler() 绑定的调度器执行，未绑定时只在
+    flush() 或 close() 时写盘。
+    """
+
+    def __init__(self, path='line_health.db', flush_delay=5):
+        """初始化存储并建表"""
+        self.path = path
+        self.flush_delay = flush_delay  # 写盘合并窗口（秒）
+        self.logger = logging.getLogger('VIPParser')
+        self._dirty = {}  # 等待写盘的记录
+        self._scheduler = None
+        self._flush_job = None
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS line_health ('
+                'name TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        """打开数据库连接（每次写盘单独连接，避免跨线程共享）"""
+        return sqlite3.connect(self.path, timeout=5)
+
+    def load(self):
+        """读取全部线路记录，返回 {线路名称: 记录}"""
+        records = {}
+        try:
+            with self._connect() as conn:
+                for name, data in conn.execute('SELECT name, data FROM line_health'):
+                    try:
+                        records[name] = json.loads(data)
+                    except ValueError:
+                        continue
+        except sqlite3.Error as e:
+            self.logger.error(f"读取线路健康数据失败: {e}")
+        return records
+
+    def bind_scheduler(self, scheduler):
+        """使用指定的 scheduler.Scheduler 执行延时写盘"""
+        self._scheduler = scheduler
+
+    def put(self, name, record):
+        """记录一条线路的最新数据，稍后批量写盘"""
+        with self._lock:
+            self._dirty[name] = record
+            if self._flush_job is None and self._scheduler is not None:
+                self._flush_job = self._scheduler.call_later(self.flush_delay, self.flush)
+
+    def flush(self):
+        """把积累的记录一次性写入数据库"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            if self._flush_job is not None:
+                self._flush_job.cancel()
+                self._flush_job = None
+        if not dirty:
+            return 0
+
+        now = time.time()
+        rows = [(name, json.dumps(record, ensure_ascii=False), now)
+                for name, record in dirty.items()]
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO line_health (name, data, updated_at) VALUES (?, ?, ?)',
+                    rows
+                )
+        except sqlite3.Error as e:
+            self.logger.error(f"保存线路健康数据失败: {e}")
+        return len(rows)
+
+    def close(self):
+        """写入剩余记录"""
+        self.flush()
@@ -0,0 +1,150 @@
+import math
+import random
+import threading
+import time
+
+
+class LineStats:
+    """单条线路随时间衰减的统计"""
+
+    __slots__ = ('successes', 'failures', 'latency', 'updated_at')
+
+    def __init__(self, latency=None, updated_at=0):
+        self.successes = 0.0  # 衰减后的成功次数
+        self.failures = 0.0  # 衰减后的失败次数
+        self.latency = latency  # 成功请求响应时间的指数加权平均
+        self.updated_at = updated_at  # 最近一次更新的时间
+
+
+class LineRanker:
+    """基于衰减统计和汤普森采样的线路排序
+
+    成功/失败次数按 half_life 半衰期随时间衰减，响应时间取指数加权平均，
+    因此很久以前表现好的线路不会一直排在前面。选择线路时从每条线路成功率的
+    Beta 后验中采样，响应时间也按样本数量加入对数正态扰动，
+    未测试或长期未测试的线路因此有机会被重新探索。
+    记录和排序可以带一个场景（如视频平台），线路在每个场景下另有一份统计，
+    以全局成功率为先验，场景内样本越多越以场景内的表现为准。
+    时钟和随机数发生器可以注入，便于用合成的延迟序列复现排序结果。
+    """
+
+    def __init__(self, half_life=1800, latency_alpha=0.3, default_latency=1.0,
+                 clock=time.time, rng=None):
+        """初始化排序器"""
+        self.half_life = half_life  # 统计半衰期（秒）
+        self.latency_alpha = latency_alpha  # 响应时间平滑系数
+        self.default_latency = default_latency  # 没有样本时假设的响应时间（秒）
+        self.latency_floor = 0.05  # 计算得分时响应时间的下限，避免除以极小值
+        self.latency_spread = 1.0  # 没有样本时响应时间采样的对数标准差
+        self.context_prior_weight = 2.0  # 场景统计中全局成功率先验相当的样本数
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, name, now):
+        """取出线路统计并衰减到当前时间（调用方需持有锁）"""
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = LineStats(updated_at=now)
+            return stats
+        elapsed = now - stats.updated_at
+        if elapsed > 0:
+            factor = 0.5 ** (elapsed / self.half_life)
+            stats.successes *= factor
+            stats.failures *= factor
+            stats.updated_at = now
+        return stats
+
+    def export(self, name, context=None):
+        """导出线路（在某场景下）的统计，用于持久化；没有统计时返回None"""
+        key = name if context is None else (name, context)
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                return None
+            return {slot: getattr(stats, slot) for slot in LineStats.__slots__}
+
+    def restore(self, name, data, context=None):
+        """从持久化数据恢复线路统计，衰减从保存时的时间继续计算"""
+        key = name if context is None else (name, context)
+        with self._lock:
+            stats = self.stats[key] = LineStats()
+            for slot in LineStats.__slots__:
+                if slot in data:
+                    setattr(stats, slot, data[slot])
+
+    def contexts(self, name):
+        """返回线路有统计的全部场景"""
+        with self._lock:
+            return [key[1] for key in self.stats if isinstance(key, tuple) and key[0] == name]
+
+    def _update(self, stats, latency, success):
+        """把一次请求结果计入统计（调用方需持有锁）"""
+        if success:
+            stats.successes += 1
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                stats.latency += self.latency_alpha * (latency - stats.latency)
+        else:
+            stats.failures += 1
+
+    def record(self, name, latency, success, context=None):
+        """记录一次请求结果，指定场景时同时计入该场景的统计"""
+        with self._lock:
+            now = self.clock()
+            self._update(self._decayed(name, now), latency, success)
+            if context is not None:
+                self._update(self._decayed((name, context), now), latency, success)
+
+    def _score(self, success_rate, latency):
+        """单位响应时间内的成功概率，越大越好"""
+        return success_rate / max(latency, self.latency_floor)
+
+    def _latency(self, stats):
+        """线路的响应时间估计"""
+        return stats.latency if stats.latency is not None else self.default_latency
+
+    def _posterior(self, name, context):
+        """返回成功率 Beta 后验的两个参数、响应时间估计和成功样本数（调用方需持有锁）"""
+        now = self.clock()
+        stats = self._decayed(name, now)
+        alpha, beta = stats.successes + 1, stats.failures + 1
+        if context is None or (name, context) not in self.stats:
+            return alpha, beta, self._latency(stats), stats.successes
+        # 场景内的统计以全局成功率为先验
+        local = self._decayed((name, context), now)
+        prior = alpha / (alpha + beta)
+        latency = local.latency if local.latency is not None else self._latency(stats)
+        return (local.successes + self.context_prior_weight * prior,
+                local.failures + self.context_prior_weight * (1 - prior),
+                latency, local.successes)
+
+    def expected_score(self, name, context=None):
+        """按后验均值计算的得分"""
+        with self._lock:
+            alpha, beta, latency, _ = self._posterior(name, context)
+            return self._score(alpha / (alpha + beta), latency)
+
+    def sampled_score(self, name, context=None):
+        """按汤普森采样计算的得分"""
+        with self._lock:
+            alpha, beta, latency, successes = self._posterior(name, context)
+            success_rate = self.rng.betavariate(alpha, beta)
+            # 成功样本越少，响应时间估计越不确定
+            sigma = self.latency_spread / math.sqrt(successes + 1)
+            latency *= math.exp(self.rng.gauss(0, sigma))
+            return self._score(success_rate, latency)
+
+    def rank(self, names, explore=False, context=None):
+        """返回排序后的线路名称，explore为True时使用采样得分以便探索，
+        指定场景时按线路在该场景下的表现排序"""
+        score = self.sampled_score if explore else self.expected_score
+        scores = {name: score(name, context) for name in names}
+        return sorted(names, key=scores.get, reverse=True)
+
+    def select(self, names, context=None):
+        """用汤普森采样选出一条线路"""
+        ranked = self.rank(list(names), explore=True, context=context)
+        return ranked[0] if ranked else None
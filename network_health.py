@@ -0,0 +1,161 @@
+import concurrent.futures
+import logging
+import threading
+import time
+
+from singleflight import SingleFlight
+
+
+class NetworkHealth:
+    """根据真实请求的结果推断网络状态
+
+    解析、检测和测速发出的请求都通过 record() 报告结果：收到任何响应即认为
+    网络正常；连续 failure_threshold 次连接失败或超时后，同时访问几个常用站点
+    确认，全部失败才判定网络异常（单条线路挂掉不算断网）；已判定异常或
+    未到下次检测时间时不再因失败额外检测。
+    最近 quiet_after 秒内有请求时不主动检测；没有请求时每 check_interval 秒
+    主动检测一次，网络异常期间检测间隔按2倍递增，最长 max_backoff 秒。
+    状态变化时调用 add_listener() 注册的回调 callback(online)。
+    """
+
+    def __init__(self, session, probe_urls, scheduler, executor, failure_threshold=3,
+                 quiet_after=60, check_interval=60, max_backoff=600, probe_timeout=3,
+                 tick=10, metrics=None, clock=time.time):
+        """初始化
+
+        scheduler 为执行定时检测的 scheduler.Scheduler，用户空闲时暂停检测；
+        executor 为并发访问检测站点的线程池。
+        """
+        self.session = session
+        self.probe_urls = list(probe_urls)  # 主动检测访问的站点
+        self.scheduler = scheduler
+        self.executor = executor
+        self.failure_threshold = failure_threshold  # 连续失败多少次后主动确认
+        self.quiet_after = quiet_after  # 多久没有请求后开始主动检测（秒）
+        self.check_interval = check_interval  # 网络正常时的主动检测间隔（秒）
+        self.max_backoff = max_backoff  # 网络异常时的最长检测间隔（秒）
+        self.probe_timeout = probe_timeout  # 检测请求超时（秒）
+        self.tick = tick  # 检查是否需要主动检测的间隔（秒）
+        self.clock = clock
+        self.logger = logging.getLogger('VIPParser')
+        self.metrics = metrics if metrics is not None else {}
+        self.metrics.setdefault('network_probes', 0)
+        self.online = True
+        self.last_check = clock()  # 最近一次得到网络状态的时间
+        self.error = None  # 最近一次判定网络异常的原因
+        self._last_traffic = None  # 最近一次真实请求的时间
+        self._failures = 0  # 连续失败次数
+        self._backoff = check_interval
+        self._next_probe = 0
+        self._listeners = []
+        self._flight = SingleFlight(metrics_name='network_probes_coalesced')
+        self._lock = threading.Lock()
+        self._job = None
+
+    @property
+    def status(self):
+        """当前网络状态：{'status': 是否正常, 'last_check': 时间, 'error': 异常原因}"""
+        status = {'status': self.online, 'last_check': self.last_check}
+        if not self.online:
+            status['error'] = self.error
+        return status
+
+    def add_listener(self, callback):
+        """注册状态变化回调 callback(online)，在报告结果的线程中调用"""
+        self._listeners.append(callback)
+
+    def _set(self, online, error=None):
+        """更新状态，发生变化时通知回调"""
+        with self._lock:
+            self.last_check = self.clock()
+            changed = online != self.online
+            self.online = online
+            self.error = error
+            if online:
+                self._backoff = self.check_interval
+        if changed:
+            self.logger.info("网络已恢复" if online else f"网络异常: {error}")
+            for callback in list(self._listeners):
+                try:
+                    callback(online)
+                except Exception as e:
+                    self.logger.error(f"网络状态回调出错: {e}")
+
+    def record(self, ok, error=None):
+        """报告一次真实请求的结果：ok 为是否收到响应，失败时 error 为原因"""
+        suspect = False
+        with self._lock:
+            self._last_traffic = self.clock()
+            if ok:
+                self._failures = 0
+            else:
+                self._failures += 1
+                suspect = (self._failures >= self.failure_threshold and self.online
+                           and self.clock() >= self._next_probe)
+                if suspect:
+                    self._failures = 0
+                    self._next_probe = self.clock() + self._backoff  # 检测进行中不再重复触发
+        if ok:
+            self._set(True)
+        elif suspect:
+            # 连续失败可能只是线路本身的问题，主动访问常用站点确认
+            self.scheduler.submit(self._probe_and_reschedule)
+
+    def probe(self):
+        """同时访问全部检测站点，任意一个有响应即为网络正常，返回是否正常
+
+        同一时刻只进行一次检测，其他调用者共用结果。
+        """
+        return self._flight.do('probe', self._probe)
+
+    def _probe(self):
+        self.metrics['network_probes'] += 1
+        futures = [self.executor.submit(self._probe_one, url) for url in self.probe_urls]
+        error = None
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                continue
+            for other in futures:
+                other.cancel()
+            self._set(True)
+            return True
+        self._set(False, error or "所有测试站点均无法访问")
+        return False
+
+    def _probe_one(self, url):
+        self.session.head(url, timeout=self.probe_timeout, allow_redirects=False, verify=False)
+
+    def check(self):
+        """定时任务：没有近期请求或网络异常时，按间隔主动检测"""
+        now = self.clock()
+        with self._lock:
+            recent = self._last_traffic is not None and now - self._last_traffic < self.quiet_after
+            if (recent and self.online) or now < self._next_probe:
+                return
+        self._probe_and_reschedule()
+
+    def _probe_and_reschedule(self):
+        """主动检测一次，并按结果安排下次检测时间（异常时间隔加倍）"""
+        online = self.probe()
+        with self._lock:
+            if not online:
+                self._backoff = min(self.max_backoff, self._backoff * 2)
+            self._next_probe = self.clock() + self._backoff
+        return online
+
+    def start(self):
+        """在后台开始按需检测，立即检测一次"""
+        with self._lock:
+            if self._job is None:
+                self._job = self.scheduler.call_every(self.tick, self.check, delay=0,
+                                                      pause_when_idle=True)
+
+    def stop(self):
+        """停止检测"""
+        with self._lock:
+            if self._job is not None:
+                self._job.cancel()
+                self._job = None
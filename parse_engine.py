@@ -0,0 +1,887 @@
+import concurrent.futures
+import functools
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+from cancellation import CancellableHTTPAdapter, CancelToken, Cancelled, bind, record_connects
+from circuit_breaker import CircuitBreaker
+from health_scheduler import HealthScheduler
+from line_ranker import LineRanker
+from network_health import NetworkHealth
+from prewarm import ConnectionPrewarmer, origin_of
+from result_cache import TTLCache
+from retry_policy import RetryPolicy
+from scheduler import Scheduler
+from singleflight import SingleFlight
+from speed_test import SpeedTester
+from video_platforms import canonical_key, identify, video_identity
+
+
+# 内置解析线路
+DEFAULT_API_LIST = {
+    '线路1 - 稳定(需要VPN)': 'https://jx.playerjy.com/?url=',  # 需要VPN访问
+    '线路2 - 备用': 'https://jx.jsonplayer.com/player/?url=',
+    '线路3 - 通用': 'https://jx.aidouer.net/?url=',
+    '线路4 - 高速': 'https://jx.bozrc.com:4433/player/?url=',
+    '线路5 - 超清': 'https://jx.zhanlangbu.com/?url=',
+    '线路6 - 急速': 'https://jx.ppflv.com/?url=',
+    '线路7 - 优选': 'https://jx.xyflv.com/?url=',
+    '线路8 - 备选': 'https://jx.m3u8.tv/jiexi/?url=',
+    '线路9 - M3U8': 'https://jx.m3u8.pw/?url=',
+    '线路10 - 全能': 'https://jx.xyflv.cc/?url=',
+    '线路11 - 智能': 'https://jx.jsonplayer.net/player/?url=',
+    '线路12 - 解析': 'https://jx.xmflv.com/?url=',
+    '线路13 - 云解析': 'https://jx.yparse.com/index.php?url=',
+    '线路14 - 8090': 'https://www.8090g.cn/?url=',
+    '线路15 - 快速': 'https://api.jiexi.la/?url=',
+    '线路16 - 免费': 'https://www.pangujiexi.cc/jiexi.php?url=',
+    '线路17 - 高清': 'https://www.ckmov.vip/api.php?url=',
+    '线路18 - B站1': 'https://jx.bozrc.com:4433/player/?url=',
+    '线路19 - B站2': 'https://jx.parwix.com:4433/player/?url=',
+    '线路20 - 万能': 'https://jx.ivito.cn/?url=',
+    '线路21 - OK': 'https://okjx.cc/?url=',
+    '线路22 - 夜幕': 'https://www.yemu.xyz/?url=',
+    '线路23 - 虾米': 'https://jx.xmflv.com/?url=',
+    '线路24 - 爱豆': 'https://jx.aidouer.net/?url=',
+    '线路25 - 诺讯': 'https://www.nxflv.com/?url='
+}
+
+# 检测线路时使用的测试视频
+TEST_VIDEO_URL = "https://www.iqiyi.com/v_19rr1skq2c.html"
+
+# 网络状态检测使用的站点
+NETWORK_TEST_URLS = [
+    'https://www.baidu.com',
+    'https://www.qq.com',
+    'https://www.iqiyi.com'
+]
+
+
+class ParseError(Exception):
+    """解析失败"""
+
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+@functools.lru_cache(maxsize=256)
+def normalize_endpoint(api_url):
+    """把线路地址归一化为接口标识，大小写和默认端口不同的写法得到相同的结果
+
+    线路数量有限而调用非常频繁，结果按线路地址缓存。
+    """
+    try:
+        parts = urlsplit(api_url.strip())
+        host = parts.hostname or ''
+        port = parts.port
+    except ValueError:
+        return api_url.strip()
+    scheme = parts.scheme.lower()
+    if port is not None and port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
+
+def _quantile(values, q):
+    """计算分位数（最近秩法）"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))
+    return ordered[index]
+
+
+class ParseEngine:
+    """视频解析核心，不依赖任何界面组件，可在无显示环境下直接使用"""
+
+    def __init__(self, api_list=None, health_store=None, disk_cache=None, dns_cache=None):
+        """初始化解析核心
+
+        health_store 用于在重启之间保留线路统计，
+        disk_cache 为可选的磁盘缓存，重启后仍能直接返回解析过的结果，
+        dns_cache 为可选的域名解析缓存，传入后请求建立连接时不再每次查询系统解析器。
+        """
+        self.logger = logging.getLogger('VIPParser')
+
+        # 解析线路及其状态
+        self.api_list = dict(api_list or DEFAULT_API_LIST)
+        self.api_status = {}
+        self._endpoint_groups = None  # (线路列表快照, 分组结果)
+
+        # API性能统计，按接口标识保存，指向同一接口的多个线路名称共用一份
+        self.api_performance = {}  # 用于存储API响应时间统计
+        self._stats_lock = threading.Lock()  # 多个检测线程会同时写入统计
+
+        # 熔断配置：连续失败的线路在冷却期内直接判定失败，不再发出请求
+        self.breaker_failure_threshold = 5  # 连续失败多少次后熔断
+        self.breaker_cooldown = 60  # 熔断冷却时间（秒）
+        self.breakers = {}
+
+        # 线路排序：衰减统计 + 汤普森采样
+        self.ranker = LineRanker()
+
+        # 性能监控
+        self.performance_metrics = {
+            'parse_times': [],  # 解析时间记录
+            'api_response_times': {},  # API响应时间
+            'cache_hits': 0,  # 缓存命中次数
+            'cache_misses': 0,  # 缓存未命中次数
+            'cache_evictions': 0,  # 缓存容量淘汰次数
+            'cache_expirations': 0,  # 缓存过期清理次数
+            'failed_attempts': 0,  # 失败尝试次数
+            'hedged_requests': 0,  # 发出的对冲请求次数
+            'hedge_wins': 0,  # 对冲请求先于主线路返回的次数
+            'coalesced_requests': 0,  # 与进行中的相同检测合并、未单独发出的请求次数
+            'cold_probe_times': [],  # 新建连接的请求响应时间
+            'warm_probe_times': [],  # 复用已有连接的请求响应时间
+        }
+
+        # 缓存管理：最多100条，1小时过期，命中统计写入 performance_metrics
+        self.cache = TTLCache(maxsize=100, ttl=3600, metrics=self.performance_metrics)
+        self.disk_cache = disk_cache
+        if self.disk_cache is not None:
+            self.disk_cache.bind_metrics(self.performance_metrics)
+
+        # 失败结果缓存：(线路, 视频) 检测失败后短时间内直接判定失败，过期时间与正常缓存分开设置
+        # 同一时刻对同一线路、同一视频的检测只发出一次
+        self.single_flight = SingleFlight(metrics=self.performance_metrics)
+        self.negative_cache = TTLCache(maxsize=1000, ttl=60, metrics=self.performance_metrics,
+                                       metrics_prefix='negative_cache_')
+
+        # 线程池（线程在首次提交任务时才会创建）
+        self.thread_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(32, (os.cpu_count() or 1) * 4),  # 根据CPU核心数动态设置
+            thread_name_prefix="VIPParser"
+        )
+        # 定时任务调度：预热、预解析、后台检测、延时写盘和对冲计时共用一个调度线程和小线程池，
+        # 默认不判断空闲，有界面时由界面设置 scheduler.idle_after 并在用户操作时调用 touch()
+        self.scheduler = Scheduler(workers=4)
+        self.batch_concurrency = 8  # 批量解析时同时检测的链接数
+        self.race_width = 3  # 竞速模式同时检测的线路数
+
+        # 对冲请求配置：主线路超过其历史响应时间分位数仍未返回时，向次优线路补发请求
+        self.hedge_enabled = True
+        self.hedge_quantile = 0.95  # 触发对冲的响应时间分位数
+        self.hedge_min_samples = 5  # 样本不足时不对冲
+        self.latency_history = 50  # 每条线路保留的响应时间样本数
+
+        # 域名解析缓存，统计写入性能监控
+        self.dns_cache = dns_cache
+        if self.dns_cache is not None:
+            self.dns_cache.bind_metrics(self.performance_metrics)
+
+        # 请求会话配置
+        self.session = requests.Session()
+        adapter = CancellableHTTPAdapter(
+            pool_connections=100,  # 连接池大小
+            pool_maxsize=100,  # 最大连接数
+            max_retries=0,  # 重试统一由 retry_policy 控制，连接层不再重试
+            pool_block=False,  # 连接池满时不阻塞
+            dns_cache=self.dns_cache  # 只有本会话的连接使用解析缓存
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+            'Connection': 'keep-alive'
+        })
+
+        # 连接预热：定时为排名靠前的线路保持空闲连接，需要时调用 prewarmer.start()
+        self.prewarmer = ConnectionPrewarmer(
+            self.session,
+            lambda: [self.api_list[name] for name in self.rank_lines() if name in self.api_list],
+            self.scheduler,
+            metrics=self.performance_metrics
+        )
+
+        # 后台健康检测：排名越靠前检测越频繁，每分钟最多6次，需要时调用 health_scheduler.start()
+        self.health_scheduler = HealthScheduler(
+            self.health_probe, self.health_targets, self.scheduler,
+            last_checked=self._last_checked,
+            budget_per_minute=6,
+            metrics=self.performance_metrics
+        )
+
+        # 网络状态：根据真实请求的结果推断，没有请求时才主动检测，需要时调用 network_health.start()
+        self.network_health = NetworkHealth(self.session, NETWORK_TEST_URLS, self.scheduler,
+                                            self.thread_pool, metrics=self.performance_metrics)
+
+        # 重试策略：单次超时5秒，最多尝试2次，指数退避加抖动，整个检测最多8秒
+        self.retry_policy = RetryPolicy(max_attempts=2, attempt_timeout=5, deadline=8,
+                                        base_delay=0.5, backoff=2, max_delay=10)
+
+        # 自适应超时：每条线路的连接/读取超时取近期耗时分位数的若干倍，
+        # 下限防止偶发抖动误判，上限为重试策略的单次超时
+        self.timeout_quantile = 0.95  # 估计超时用的分位数
+        self.timeout_multiplier = 3  # 分位数的倍数
+        self.timeout_min_samples = 5  # 样本不足时使用上限
+        self.connect_timeout_floor = 0.5  # 连接超时下限（秒）
+        self.read_timeout_floor = 1.0  # 读取超时下限（秒）
+        self.connect_samples = {}  # 源 -> 最近新建连接的耗时
+
+        # 载入上次保存的线路统计，启动后排序立即可用
+        self.health_store = health_store
+        if self.health_store is not None:
+            self.health_store.bind_scheduler(self.scheduler)
+            self.load_line_health()
+
+    def close(self):
+        """保存线路统计并释放线程池和连接"""
+        try:
+            self.prewarmer.stop()
+            self.health_scheduler.stop()
+            self.network_health.stop()
+            if self.dns_cache is not None:
+                self.dns_cache.stop_prefetch()
+            self.scheduler.shutdown()
+            if self.health_store is not None:
+                self.health_store.close()
+            if self.disk_cache is not None:
+                self.disk_cache.close()
+            self.thread_pool.shutdown(wait=False)
+            self.session.close()
+        except Exception:
+            pass
+
+    def validate_url(self, url):
+        """验证URL格式，返回平台标识，不支持的链接返回None"""
+        identified = identify(url)
+        return identified[0] if identified else None
+
+    def video_identity(self, url):
+        """返回 (平台标识, 视频标识)，不支持的链接平台为None
+
+        批量解析时每个链接只调用一次，结果传给缓存、竞速和检测，不再重复解析链接。
+        """
+        return video_identity(url)
+
+    def check_url_availability(self, url, api_name=None, deadline=None, policy=None, timeouts=None):
+        """检查URL可用性，指定线路时熔断中的线路直接返回False
+
+        按 policy（默认为 retry_policy）重试，deadline 为调用方传下来的截止时间，
+        不传时按策略的时间上限新建。截止时间附带的令牌被取消时抛出 Cancelled。
+        timeouts 为 (连接超时, 读取超时)，不传时两者都用策略的单次超时。
+        """
+        if api_name is not None and self.is_circuit_open(api_name):
+            return False
+        policy = policy or self.retry_policy
+        if deadline is None:
+            deadline = policy.new_deadline()
+
+        def attempt(timeout):
+            if timeouts is not None:
+                timeout = (min(timeouts[0], timeout), min(timeouts[1], timeout))
+            return self._head(url, timeout, deadline.token)
+
+        try:
+            response = policy.call(attempt, deadline)
+            return self.is_success_status(response.status_code)
+        except Cancelled:
+            raise
+        except Exception:
+            return False
+
+    @staticmethod
+    def is_success_status(status_code):
+        """跟随重定向后的最终状态码是否表示线路可用，检测和测速共用"""
+        return status_code == 200
+
+    def _head(self, url, timeout, token=None):
+        """发出 HEAD 请求，并按是否新建了连接分别记录响应时间
+
+        token 被取消时正在进行的请求立即中断并抛出 Cancelled。
+        """
+        start_time = time.time()
+        with bind(token), record_connects() as connect_times:
+            try:
+                response = self.session.head(
+                    url,
+                    timeout=timeout,
+                    allow_redirects=True,
+                    verify=False
+                )
+            except requests.RequestException as e:
+                if token is not None and token.cancelled:
+                    raise Cancelled("操作已取消")
+                if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                    self.network_health.record(False, str(e))
+                raise
+        elapsed = time.time() - start_time
+        self.network_health.record(True)
+        # 只看本线程这次请求是否新建了连接，并发请求同一主机时互不影响
+        cold = bool(connect_times)
+        with self._stats_lock:
+            samples = self.performance_metrics['cold_probe_times' if cold else 'warm_probe_times']
+            samples.append(elapsed)
+            if len(samples) > self.latency_history:
+                samples.pop(0)
+            if connect_times:
+                self._record_connect_time(url, connect_times[0])
+        self.prewarmer.mark_used(url)
+        return response
+
+    def _record_connect_time(self, url, seconds):
+        """记录一次新建连接的耗时，用于估计连接超时（调用方需持有统计锁）"""
+        samples = self.connect_samples.setdefault(origin_of(url), [])
+        samples.append(seconds)
+        if len(samples) > self.latency_history:
+            samples.pop(0)
+
+    def connection_latency(self):
+        """冷、热连接请求的平均响应时间和样本数：{'cold': (平均, 次数), 'warm': (平均, 次数)}"""
+        summary = {}
+        with self._stats_lock:
+            for name in ('cold', 'warm'):
+                samples = self.performance_metrics[f'{name}_probe_times']
+                summary[name] = (sum(samples) / len(samples) if samples else None, len(samples))
+        return summary
+
+    def resolve(self, url, api_name):
+        """解析单个视频链接，返回 (解析地址, 是否来自缓存)，失败时抛出 ParseError"""
+        if api_name not in self.api_list:
+            raise ParseError(f"未知的解析线路: {api_name}")
+        platform, video_key = self.video_identity(url)
+        if not platform:
+            raise ParseError(f"无效的视频网站链接 - {url}")
+
+        cache_key = self.cache_key(api_name, url, video_key)
+        cached_result = self.get_from_cache(cache_key)
+        if cached_result:
+            return cached_result, True
+
+        if self.is_circuit_open(api_name):
+            raise ParseError("当前解析线路连续失败，已暂时熔断")
+
+        start_time = time.time()
+        parse_url = self.api_list[api_name] + url
+        if not self.probe_line(api_name, url, video_key=video_key, platform=platform):
+            self.performance_metrics['failed_attempts'] += 1
+            raise ParseError("当前解析线路不可用")
+
+        self.performance_metrics['parse_times'].append(time.time() - start_time)
+        self.add_to_cache(cache_key, parse_url)
+        return parse_url, False
+
+    def line_key(self, api_name, api_url=None):
+        """线路的接口标识，统计、熔断和失败缓存都按它记录，同一接口的别名共享结果"""
+        if api_url is None:
+            api_url = self.api_list.get(api_name)
+            if api_url is None:
+                return api_name
+        return normalize_endpoint(api_url)
+
+    def endpoint_groups(self):
+        """按接口标识分组的线路名称，顺序与线路列表一致
+
+        线路列表没有变化时返回上次的分组结果，调用方不要修改。
+        """
+        items = tuple(self.api_list.items())
+        cached = self._endpoint_groups
+        if cached is not None and cached[0] == items:
+            return cached[1]
+        groups = {}
+        for api_name, api_url in items:
+            groups.setdefault(self.line_key(api_name, api_url), []).append(api_name)
+        self._endpoint_groups = (items, groups)
+        return groups
+
+    def line_hosts(self):
+        """线路列表中出现的全部主机名"""
+        hosts = []
+        for api_url in self.api_list.values():
+            host = urlsplit(api_url).hostname
+            if host and host not in hosts:
+                hosts.append(host)
+        return hosts
+
+    def line_stats(self, api_name):
+        """返回线路的性能统计，没有统计时返回None"""
+        return self.api_performance.get(self.line_key(api_name))
+
+    def get_breaker(self, api_name):
+        """获取线路的熔断器"""
+        return self._breaker(self.line_key(api_name))
+
+    def _breaker(self, key):
+        """获取接口的熔断器，不存在时创建"""
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers.setdefault(
+                key,
+                CircuitBreaker(self.breaker_failure_threshold, self.breaker_cooldown)
+            )
+        return breaker
+
+    def is_circuit_open(self, api_name):
+        """线路是否处于熔断冷却期"""
+        breaker = self.breakers.get(self.line_key(api_name))
+        return breaker is not None and breaker.is_open()
+
+    def _video_key(self, url):
+        """视频在缓存中的标识（平台+视频ID），同一视频的不同链接得到相同的标识"""
+        return canonical_key(url)
+
+    def cache_key(self, api_name, url, video_key=None):
+        """解析结果的缓存键，已知视频标识时传入 video_key 不再解析链接"""
+        if video_key is None:
+            video_key = self._video_key(url)
+        return f"{self.line_key(api_name)}_{video_key}"
+
+    def is_known_bad(self, api_name, url, video_key=None):
+        """该线路近期是否已确认无法解析此视频"""
+        if video_key is None:
+            video_key = self._video_key(url)
+        return (self.line_key(api_name), video_key) in self.negative_cache
+
+    def probe_line(self, api_name, url, api_url=None, skip_known_bad=True, deadline=None,
+                   video_key=None, platform=None, policy=None):
+        """检测指定线路能否解析该视频，并记录响应时间
+
+        skip_known_bad 为True时，近期失败过的 (线路, 视频) 组合直接返回False；
+        检测失败的组合总会写入失败结果缓存。
+        其他线程正在检测同一组合时不再重复请求，直接等待并共用其结果。
+        deadline 为整个操作的截止时间，重试和等待都不会超过它；
+        其附带的令牌被取消时抛出 Cancelled，被取消的检测不计入统计。
+        video_key 和 platform 为调用方已经得到的 video_identity(url)，不传时在这里解析。
+        policy 为重试策略，默认为 retry_policy。
+        """
+        if api_url is None:
+            api_url = self.api_list[api_name]
+        if video_key is None:
+            platform, video_key = self.video_identity(url)
+        negative_key = (self.line_key(api_name, api_url), video_key)
+        if skip_known_bad and self.negative_cache.get(negative_key) is not None:
+            return False
+        token = deadline.token if deadline is not None else None
+        return self._single_flight(('probe',) + negative_key, token, self._probe_line,
+                                   api_name, url, api_url, negative_key, deadline, platform, policy)
+
+    def _single_flight(self, key, token, func, *args):
+        """合并相同的请求；共用的请求被别人取消而自己没有取消时重新发起
+
+        等待别人发起的请求时，自己的令牌被取消会立即抛出 Cancelled。
+        """
+        wait = concurrent.futures.Future.result if token is None else token.wait_for
+        while True:
+            try:
+                return self.single_flight.do_waiting(key, wait, func, *args)
+            except Cancelled:
+                if token is not None and token.cancelled:
+                    raise
+
+    def _probe_line(self, api_name, url, api_url, negative_key, deadline, platform, policy):
+        """实际发出检测请求并记录结果"""
+        breaker = self.get_breaker(api_name)
+        if not breaker.allow():
+            return False
+        start_time = time.time()
+        try:
+            ok = self.check_url_availability(api_url + url, deadline=deadline, policy=policy,
+                                             timeouts=self.line_timeouts(api_name, api_url))
+        except Cancelled:
+            breaker.record_cancelled()
+            raise
+        self.update_api_performance(api_name, time.time() - start_time, ok, platform=platform)
+        if ok:
+            self.negative_cache.pop(negative_key)
+        else:
+            self.negative_cache.put(negative_key, True)
+        return ok
+
+    def line_timeouts(self, api_name, api_url=None):
+        """线路当前的 (连接超时, 读取超时)，没有统计时两者都为重试策略的单次超时"""
+        stats = self.api_performance.get(self.line_key(api_name, api_url))
+        if stats and stats.get('timeouts'):
+            return tuple(stats['timeouts'])
+        ceiling = self.retry_policy.attempt_timeout
+        return ceiling, ceiling
+
+    def _adaptive_timeouts(self, key, stats):
+        """根据近期连接耗时和响应时间估计超时（调用方需持有统计锁）"""
+        ceiling = self.retry_policy.attempt_timeout
+
+        def estimate(samples, floor):
+            if len(samples) < self.timeout_min_samples:
+                return ceiling
+            value = _quantile(samples, self.timeout_quantile) * self.timeout_multiplier
+            return min(ceiling, max(floor, value))
+
+        return [estimate(self.connect_samples.get(origin_of(key), []), self.connect_timeout_floor),
+                estimate(stats['latency_samples'], self.read_timeout_floor)]
+
+    def latency_quantile(self, api_name, q):
+        """返回线路成功响应时间的分位数，样本不足时返回None"""
+        stats = self.line_stats(api_name)
+        if not stats:
+            return None
+        samples = list(stats['latency_samples'])
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return _quantile(samples, q)
+
+    def hedged_probe_async(self, api_name, url, token=None, video_key=None, platform=None):
+        """带对冲的线路检测，返回Future，结果为 (线路名称, 解析地址) 或 None
+
+        主线路在其历史响应时间的 hedge_quantile 分位数内没有返回时，
+        向排名最靠前的另一条线路补发一次检测，取先成功的结果，另一个检测随即中断。
+        token 被取消时中断进行中的检测，结果为 None。
+        video_key 和 platform 同 probe_line，不传时在这里解析一次。
+        """
+        if video_key is None:
+            platform, video_key = self.video_identity(url)
+        api_urls = {api_name: self.api_list[api_name]}
+        threshold = None
+        if self.hedge_enabled:
+            threshold = self.latency_quantile(api_name, self.hedge_quantile)
+        backup_name = None
+        if threshold is not None:
+            primary_key = self.line_key(api_name)
+            backup_name = next((name for name in self.rank_lines(platform=platform)
+                                if self.line_key(name) != primary_key
+                                and not self.is_circuit_open(name)
+                                and not self.is_known_bad(name, url, video_key)), None)
+        if backup_name is not None:
+            api_urls[backup_name] = self.api_list[backup_name]
+
+        result = concurrent.futures.Future()
+        result.set_running_or_notify_cancel()
+        lock = threading.Lock()
+        state = {'pending': 1, 'timer': None}
+        # 主线路和对冲请求共用同一个截止时间；得到结果后取消子令牌，中断还在进行的另一个检测
+        hedge_token = token.child() if token is not None else CancelToken()
+        deadline = self.retry_policy.new_deadline(hedge_token)
+
+        def on_probe_done(future, name):
+            try:
+                ok = not future.cancelled() and future.result()
+            except Exception:
+                ok = False
+            with lock:
+                state['pending'] -= 1
+                if result.done():
+                    return
+                if ok:
+                    if name != api_name:
+                        with self._stats_lock:
+                            self.performance_metrics['hedge_wins'] += 1
+                    result.set_result((name, api_urls[name] + url))
+                elif state['pending'] == 0:
+                    result.set_result(None)
+                else:
+                    return
+            if state['timer'] is not None:
+                state['timer'].cancel()
+            hedge_token.cancel()
+
+        def launch_backup():
+            with lock:
+                if result.done() or deadline.cancelled:
+                    return
+                state['pending'] += 1
+            with self._stats_lock:
+                self.performance_metrics['hedged_requests'] += 1
+            self.logger.info(f"{api_name} 超过 {threshold:.2f} 秒未响应，向 {backup_name} 发出对冲请求")
+            backup = self.thread_pool.submit(self.probe_line, backup_name, url, api_urls[backup_name],
+                                             deadline=deadline, video_key=video_key, platform=platform)
+            backup.add_done_callback(functools.partial(on_probe_done, name=backup_name))
+
+        if backup_name is not None:
+            # 只是提交备用检测，直接在调度线程中执行，不受线程池中长任务的影响
+            state['timer'] = self.scheduler.call_later(threshold, launch_backup, inline=True)
+
+        primary = self.thread_pool.submit(self.probe_line, api_name, url, api_urls[api_name],
+                                          deadline=deadline, video_key=video_key, platform=platform)
+        primary.add_done_callback(functools.partial(on_probe_done, name=api_name))
+        return result
+
+    def race_lines(self, url, k=None, token=None, video_key=None, platform=None):
+        """竞速检测排名靠前的K条线路，返回最先可用的 (线路名称, 解析地址)，全部失败返回None"""
+        return self.race_lines_async(url, k, token, video_key, platform).result()
+
+    def race_lines_async(self, url, k=None, token=None, video_key=None, platform=None):
+        """异步竞速检测，返回一个Future，结果同 race_lines
+
+        各线路的检测同时提交到线程池，第一条可用的线路胜出，
+        尚未开始的检测随即取消，进行中的检测通过子令牌中断（不计入统计）。
+        候选线路按其在该视频所属平台上的表现挑选。
+        整个过程不占用等待线程，可以在线程池任务中安全调用。
+        token 被取消时所有检测立即中断，结果为 None。
+        video_key 和 platform 同 probe_line，不传时在这里解析一次。
+        """
+        if video_key is None:
+            platform, video_key = self.video_identity(url)
+        candidates = []
+        seen = set()
+        for name in self.rank_lines(explore=True, platform=platform):
+            key = self.line_key(name)
+            # 同一接口的别名只检测一次
+            if key in seen or self.is_circuit_open(name) or (key, video_key) in self.negative_cache:
+                continue
+            seen.add(key)
+            candidates.append(name)
+        candidates = candidates[:k or self.race_width]
+        api_urls = {name: self.api_list[name] for name in candidates}
+
+        race = concurrent.futures.Future()
+        race.set_running_or_notify_cancel()
+        if not candidates:
+            race.set_result(None)
+            return race
+
+        lock = threading.Lock()
+        remaining = [len(candidates)]
+        probes = []
+        # 整场竞速共用同一个截止时间；决出结果后取消子令牌，中断其余进行中的检测
+        race_token = token.child() if token is not None else CancelToken()
+        deadline = self.retry_policy.new_deadline(race_token)
+
+        def on_probe_done(future, api_name):
+            try:
+                ok = not future.cancelled() and future.result()
+            except Exception:
+                ok = False
+            with lock:
+                remaining[0] -= 1
+                if race.done():
+                    return
+                if ok:
+                    race.set_result((api_name, api_urls[api_name] + url))
+                elif remaining[0] == 0:
+                    race.set_result(None)
+                else:
+                    return
+            # 已决出结果，放弃其余尚未开始的检测，中断已经发出的
+            for probe in list(probes):
+                probe.cancel()
+            race_token.cancel()
+
+        for api_name in candidates:
+            probe = self.thread_pool.submit(self.probe_line, api_name, url, api_urls[api_name],
+                                            deadline=deadline, video_key=video_key, platform=platform)
+            probes.append(probe)
+            probe.add_done_callback(functools.partial(on_probe_done, api_name=api_name))
+
+        return race
+
+    def get_from_cache(self, key):
+        """从缓存获取数据，内存未命中时查询磁盘缓存并回填内存"""
+        value = self.cache.get(key)
+        if value is None and self.disk_cache is not None:
+            entry = self.disk_cache.get_entry(key)
+            if entry is not None:
+                value, expires_at = entry
+                self.cache.put(key, value, ttl=min(self.cache.ttl, expires_at - time.time()))
+        return value
+
+    def add_to_cache(self, key, value):
+        """添加数据到缓存"""
+        self.cache.put(key, value)
+        if self.disk_cache is not None:
+            self.disk_cache.put(key, value)
+
+    def clean_expired_cache(self):
+        """清理过期缓存并压缩磁盘缓存，返回清理的条目数"""
+        expired_count = self.cache.purge_expired()
+        if self.disk_cache is not None:
+            expired_count += self.disk_cache.compact()
+        return expired_count
+
+    def clear_cache(self):
+        """清空缓存"""
+        self.cache.clear()
+        self.negative_cache.clear()
+        if self.disk_cache is not None:
+            self.disk_cache.clear()
+
+    def update_api_performance(self, api_name, response_time, success=True, platform=None):
+        """更新API性能统计，platform 为视频所属平台，用于按平台挑选线路"""
+        key = self.line_key(api_name)
+        with self._stats_lock:
+            self._update_api_performance(key, response_time, success)
+
+        # 统计结果同步给排序器和熔断器
+        self.ranker.record(key, response_time, success, context=platform)
+        breaker = self._breaker(key)
+        if success:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+        if self.health_store is not None:
+            self.health_store.put(key, self._line_health_record(key))
+
+    def _line_health_record(self, key):
+        """汇总一个接口需要持久化的数据"""
+        with self._stats_lock:
+            performance = dict(self.api_performance.get(key, {}))
+            for field in ('speed_test', 'latency_samples'):
+                if field in performance:
+                    performance[field] = list(performance[field])
+        return {
+            'performance': performance,
+            'ranker': self.ranker.export(key),
+            'platforms': {platform: self.ranker.export(key, platform)
+                          for platform in self.ranker.contexts(key)},
+            'breaker': self._breaker(key).to_dict(),
+        }
+
+    def load_line_health(self):
+        """从存储中恢复线路统计、排序数据和熔断状态"""
+        records = self.health_store.load()
+        for name, record in records.items():
+            # 旧版本按线路名称保存
+            key = self.line_key(name)
+            performance = record.get('performance')
+            if performance:
+                performance.setdefault('latency_samples', [])
+                self.api_performance[key] = performance
+            if record.get('ranker'):
+                self.ranker.restore(key, record['ranker'])
+            for platform, data in (record.get('platforms') or {}).items():
+                self.ranker.restore(key, data, context=platform)
+            if record.get('breaker'):
+                self._breaker(key).restore(record['breaker'])
+        return len(records)
+
+    def _update_api_performance(self, key, response_time, success):
+        """更新接口的性能统计（调用方需持有统计锁）"""
+        if key not in self.api_performance:
+            self.api_performance[key] = {
+                'total_time': 0,
+                'count': 0,
+                'avg_time': 0,
+                'success_rate': 0,
+                'success_count': 0,
+                'fail_count': 0,
+                'last_test': 0,
+                'speed_test': [],  # 存储最近的速度测试结果
+                'latency_samples': []  # 最近成功请求的响应时间，用于计算分位数
+            }
+
+        stats = self.api_performance[key]
+        stats['total_time'] += response_time
+        stats['count'] += 1
+        stats['avg_time'] = stats['total_time'] / stats['count']
+
+        if success:
+            stats['success_count'] += 1
+            stats['latency_samples'].append(response_time)
+            if len(stats['latency_samples']) > self.latency_history:
+                stats['latency_samples'].pop(0)
+        else:
+            stats['fail_count'] += 1
+
+        stats['success_rate'] = (stats['success_count'] /
+            (stats['success_count'] + stats['fail_count'])) * 100
+
+        # 更新速度测试结果
+        stats['speed_test'].append(response_time)
+        if len(stats['speed_test']) > 5:  # 只保留最近5次测试结果
+            stats['speed_test'].pop(0)
+
+        stats['last_test'] = time.time()
+        stats['timeouts'] = self._adaptive_timeouts(key, stats)
+        self.performance_metrics['api_response_times'][key] = response_time
+
+    def run_speed_test(self, samples=3, concurrency=6, token=None, on_result=None):
+        """并发测速全部线路，返回 speed_test.LineSpeed 列表
+
+        同一接口只测一次，熔断中的线路跳过。每条线路采样 samples 次，
+        分别记录DNS、连接、TLS握手和首字节时间；每次采样都计入线路统计，
+        连接和握手耗时用于估计自适应超时。测速的每次采样都新建连接，计入响应时间
+        统计的是首字节时间，与复用连接的检测口径一致，不会抬高对冲阈值和读取超时。
+        某条线路测完后调用 on_result(LineSpeed)。
+        已有测速在进行时不再重复测速，等它完成后共用结果（on_result 随后逐条调用）。
+        token 被取消时中断进行中的采样并抛出 Cancelled。
+        """
+        delivered = []
+
+        def deliver(result):
+            delivered.append(result)
+            if on_result is not None:
+                on_result(result)
+
+        results = self._single_flight(('speed',), token, self._run_speed_test,
+                                      samples, concurrency, token, deliver)
+        if on_result is not None and not delivered:
+            for result in results:
+                on_result(result)
+        return results
+
+    def _run_speed_test(self, samples, concurrency, token, on_result):
+        """实际发出测速请求并记录结果"""
+        lines = [(names, self.api_list[names[0]] + TEST_VIDEO_URL)
+                 for names in self.endpoint_groups().values()
+                 if not self.is_circuit_open(names[0])]
+        tester = SpeedTester(samples=samples, concurrency=concurrency,
+                             timeout=self.retry_policy.attempt_timeout,
+                             user_agent=self.session.headers.get('User-Agent', 'Mozilla/5.0'),
+                             token=token, is_success=self.is_success_status)
+        platform = self.validate_url(TEST_VIDEO_URL)
+
+        def record(result):
+            api_name = result.names[0]
+            for sample in result.samples:
+                self.network_health.record(True)
+                with self._stats_lock:
+                    self._record_connect_time(result.url, sample['connect'] + (sample['tls'] or 0))
+                # 去掉DNS、连接和握手，相当于复用连接时的响应时间
+                latency = sample['ttfb'] if sample['ttfb'] is not None else sample['total']
+                self.update_api_performance(api_name, latency, sample['ok'], platform=platform)
+            for error in result.errors:
+                self.network_health.record(False, error)
+                self.update_api_performance(api_name, tester.timeout, False, platform=platform)
+            on_result(result)
+
+        return tester.run(lines, on_result=record)
+
+    def health_targets(self):
+        """后台检测的线路及其重要程度（0到1），每个接口取一个线路名称，排名越靠前越重要；熔断中的跳过"""
+        groups = self.endpoint_groups()
+        ranked = self.ranker.rank(list(groups))
+        return [(groups[key][0], 1 - i / len(ranked))
+                for i, key in enumerate(ranked)
+                if not self.is_circuit_open(groups[key][0])]
+
+    def health_probe(self, api_name):
+        """检测一条线路的可用性，结果写入同一接口全部线路的状态，不改动线路列表
+
+        后台检测不重试，每次检测只发出一个请求，检测预算即请求预算。
+        """
+        ok = self.probe_line(api_name, TEST_VIDEO_URL, skip_known_bad=False,
+                             policy=self.retry_policy.with_overrides(max_attempts=1))
+        for name in self.endpoint_groups().get(self.line_key(api_name), [api_name]):
+            self.api_status[name] = ok
+        return ok
+
+    def _last_checked(self, api_name):
+        """线路最近一次检测的时间，没有统计时返回None"""
+        stats = self.line_stats(api_name)
+        return stats['last_test'] if stats else None
+
+    def rank_lines(self, explore=False, platform=None):
+        """返回按近期表现排序的线路名称，explore为True时按采样结果排序以探索其他线路，
+        指定平台时按线路在该平台上的表现排序；同一接口的别名排在一起"""
+        groups = self.endpoint_groups()
+        ranked = self.ranker.rank(list(groups), explore=explore, context=platform)
+        return [name for key in ranked for name in groups[key]]
+
+    def optimize_api_order(self):
+        """根据性能统计重新排序线路列表，返回是否发生了排序"""
+        if not self.api_performance:
+            return False
+
+        self.api_list = {name: self.api_list[name] for name in self.rank_lines()}
+        return True
+
+    def get_best_api(self, platform=None):
+        """获取性能最好的API（按采样结果选择，兼顾探索），可指定视频所属平台"""
+        groups = self.endpoint_groups()
+        candidates = [key for key, names in groups.items() if not self.is_circuit_open(names[0])]
+        key = self.ranker.select(candidates or list(groups), context=platform)
+        return groups[key][0] if key is not None else None
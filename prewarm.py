@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def origin_of(url):
+    """返回链接的源（协议+主机+端口），连接池按源复用连接"""
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}/"
+
+
+class ConnectionPrewarmer:
+    """为排名靠前的线路预先建立连接
+
+    后台定时对排名前 top_n 的线路所在主机发一次 HEAD 请求，让会话连接池里
+    留有已完成 DNS、TCP 和 TLS 握手的空闲连接，用户第一次解析时直接复用。
+    最近 interval 秒内用过的主机连接仍然是热的，不再重复预热。
+    """
+
+    def __init__(self, session, targets, scheduler, top_n=3, interval=45, timeout=3,
+                 metrics=None, clock=time.time):
+        """初始化
+
+        targets 为无参函数，返回按排名排序的线路地址列表；
+        scheduler 为执行定时预热的 scheduler.Scheduler，用户空闲时暂停预热。
+        """
+        self.session = session
+        self.targets = targets
+        self.scheduler = scheduler
+        self.top_n = top_n  # 预热的线路数
+        self.interval = interval  # 空闲多久后重新预热（秒），应小于服务器的keep-alive时间
+        self.timeout = timeout  # 预热请求超时（秒）
+        self.clock = clock
+        self.logger = logging.getLogger('VIPParser')
+        self.metrics = metrics if metrics is not None else {}
+        self.metrics.setdefault('prewarm_requests', 0)
+        self._last_used = {}  # 源 -> 最近一次使用连接的时间
+        self._lock = threading.Lock()
+        self._job = None
+
+    def mark_used(self, url):
+        """记录一次真实请求，刚用过的连接不需要预热"""
+        with self._lock:
+            self._last_used[origin_of(url)] = self.clock()
+
+    def warm_once(self):
+        """预热一轮，返回本轮预热的主机数"""
+        origins = []
+        for api_url in self.targets():
+            origin = origin_of(api_url)
+            if origin not in origins:
+                origins.append(origin)
+            if len(origins) >= self.top_n:
+                break
+
+        warmed = 0
+        for origin in origins:
+            with self._lock:
+                if self.clock() - self._last_used.get(origin, float('-inf')) < self.interval:
+                    continue
+            try:
+                self.session.head(origin, timeout=self.timeout, allow_redirects=False, verify=False)
+            except Exception as e:
+                self.logger.debug(f"预热连接失败 {origin}: {e}")
+                continue
+            self.mark_used(origin)
+            self.metrics['prewarm_requests'] += 1
+            warmed += 1
+        return warmed
+
+    def start(self):
+        """在后台开始定时预热，立即执行第一轮"""
+        with self._lock:
+            if self._job is None:
+                self._job = self.scheduler.call_every(self.interval, self.warm_once, delay=0,
+                                                      pause_when_idle=True)
+
+    def stop(self):
+        """停止预热"""
+        with self._lock:
+            if self._job is not None:
+                self._job.cancel()
+                self._job = None
@@ -0,0 +1,196 @@
+import heapq
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """线程安全的 LRU + TTL 缓存
+
+    查询、写入和淘汰都是 O(1)：条目按访问顺序保存在 OrderedDict 中，
+    超出容量时淘汰最久未访问的条目。过期在读取时惰性检查，另有一个
+    按过期时间排序的小顶堆，定期清理时只需弹出堆顶已过期的条目。
+    命中、未命中、淘汰和过期次数写入 metrics 字典（键名带 metrics_prefix 前缀）。
+    """
+
+    def __init__(self, maxsize=100, ttl=3600, metrics=None, metrics_prefix='cache_',
+                 clock=time.time):
+        """初始化缓存"""
+        self.maxsize = maxsize  # 最多保存的条目数
+        self.ttl = ttl  # 默认过期时间（秒）
+        self.clock = clock
+        self.metrics = metrics if metrics is not None else {}
+        self.metrics_prefix = metrics_prefix
+        for name in ('hits', 'misses', 'evictions', 'expirations'):
+            self.metrics.setdefault(metrics_prefix + name, 0)
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._expiry_heap = []  # (expires_at, key)，键被覆盖后旧的堆条目在弹出时忽略
+        self._lock = threading.Lock()
+
+    def _count(self, name, n=1):
+        """累加统计（调用方需持有锁）"""
+        self.metrics[self.metrics_prefix + name] += n
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[1] > self.clock()
+
+    def get(self, key, default=None):
+        """读取缓存，过期或不存在时返回 default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[1] > self.clock():
+                    self._data.move_to_end(key)
+                    self._count('hits')
+                    return entry[0]
+                del self._data[key]
+                self._count('expirations')
+            self._count('misses')
+            return default
+
+    def put(self, key, value, ttl=None):
+        """写入缓存，ttl 为空时使用默认过期时间"""
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._count('evictions')
+            # 被覆盖或淘汰的键会在堆里留下旧条目，堆过大时重建
+            if len(self._expiry_heap) > 2 * self.maxsize + 16:
+                self._expiry_heap = [(entry[1], k) for k, entry in self._data.items()]
+                heapq.heapify(self._expiry_heap)
+
+    def pop(self, key, default=None):
+        """删除并返回缓存条目"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def purge_expired(self):
+        """清理所有已过期的条目，返回清理数量"""
+        now = self.clock()
+        purged = 0
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires_at, key = heapq.heappop(self._expiry_heap)
+                entry = self._data.get(key)
+                if entry is not None and entry[1] == expires_at:
+                    del self._data[key]
+                    purged += 1
+            self._count('expirations', purged)
+        return purged
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self._expiry_heap = []
+
+
+class DiskCache:
+    """解析结果的磁盘缓存（SQLite WAL），作为内存缓存之后的第二级
+
+    程序重启后仍可直接返回解析结果。条目带过期时间，
+    compact() 清理过期条目并在超出 max_entries 时删除最早写入的条目。
+    """
+
+    def __init__(self, path='parse_cache.db', max_entries=5000, ttl=86400,
+                 metrics=None, metrics_prefix='disk_cache_', clock=time.time):
+        """打开数据库并建表"""
+        self.path = path
+        self.max_entries = max_entries  # 最多保存的条目数
+        self.ttl = ttl  # 默认过期时间（秒）
+        self.clock = clock
+        self.logger = logging.getLogger('VIPParser')
+        self.metrics_prefix = metrics_prefix
+        self.bind_metrics(metrics if metrics is not None else {})
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS parse_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, created_at REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS parse_cache_created ON parse_cache (created_at)'
+            )
+
+    def bind_metrics(self, metrics):
+        """把命中统计写入指定的字典"""
+        for name in ('hits', 'misses', 'compacted'):
+            metrics.setdefault(self.metrics_prefix + name, 0)
+        self.metrics = metrics
+
+    def get_entry(self, key):
+        """读取未过期的条目，返回 (值, 过期时间) 或 None"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT value, expires_at FROM parse_cache WHERE key = ? AND expires_at > ?',
+                    (key, self.clock())
+                ).fetchone()
+                self.metrics[self.metrics_prefix + ('hits' if row else 'misses')] += 1
+        except sqlite3.Error as e:
+            self.logger.error(f"读取磁盘缓存失败: {e}")
+            return None
+        return row
+
+    def get(self, key, default=None):
+        """读取缓存，过期或不存在时返回 default"""
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def put(self, key, value, ttl=None):
+        """写入缓存"""
+        now = self.clock()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO parse_cache (key, value, expires_at, created_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    (key, value, expires_at, now)
+                )
+        except sqlite3.Error as e:
+            self.logger.error(f"写入磁盘缓存失败: {e}")
+
+    def compact(self):
+        """清理过期条目并把条目数压缩到上限以内，返回删除数量"""
+        try:
+            with self._lock, self._conn:
+                removed = self._conn.execute(
+                    'DELETE FROM parse_cache WHERE expires_at <= ?', (self.clock(),)
+                ).rowcount
+                removed += self._conn.execute(
+                    'DELETE FROM parse_cache WHERE key IN ('
+                    'SELECT key FROM parse_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                ).rowcount
+                self.metrics[self.metrics_prefix + 'compacted'] += removed
+            return removed
+        except sqlite3.Error as e:
+            self.logger.error(f"压缩磁盘缓存失败: {e}")
+            return 0
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM parse_cache')
+
+    def close(self):
+        """关闭数据库"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,136 @@
+import random
+import time
+
+import requests
+
+from cancellation import Cancelled
+
+
+class DeadlineExceeded(Exception):
+    """操作超过了截止时间"""
+
+
+class Deadline:
+    """一次操作的截止时间
+
+    在调用链上传递同一个对象，各层的超时和重试等待都从剩余时间里扣除，
+    整个操作的耗时不会超过创建时给定的秒数。可以附带一个取消令牌，
+    随截止时间一起传到发出请求的那一层。
+    """
+
+    def __init__(self, seconds, clock=time.monotonic, token=None):
+        """从现在起 seconds 秒后截止"""
+        self.clock = clock
+        self.expires_at = clock() + seconds
+        self.token = token  # 取消令牌，可为None
+
+    @property
+    def cancelled(self):
+        """操作是否已被取消"""
+        return self.token is not None and self.token.cancelled
+
+    def remaining(self):
+        """剩余时间（秒），已截止时为0"""
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self):
+        """是否已截止"""
+        return self.remaining() <= 0
+
+    def timeout(self, cap):
+        """本次请求可用的超时时间：不超过 cap，也不超过剩余时间
+
+        已截止时抛出 DeadlineExceeded，已取消时抛出 Cancelled。
+        """
+        if self.cancelled:
+            raise Cancelled("操作已取消")
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("操作已超过截止时间")
+        return min(cap, remaining)
+
+
+class RetryPolicy:
+    """统一的重试策略
+
+    每次尝试的超时为 attempt_timeout，失败后按指数退避加随机抖动等待
+    （base_delay * backoff ** n，上限 max_delay，在 0 到该值之间均匀取值），
+    所有尝试和等待都受同一个截止时间约束，剩余时间不够再等一轮时直接放弃。
+    网络异常和 retry_statuses 中的状态码会重试。
+    with_overrides() 返回修改了部分参数的副本，用于单次调用。
+    """
+
+    def __init__(self, max_attempts=2, attempt_timeout=5, deadline=8, base_delay=0.5,
+                 backoff=2, max_delay=10, retry_statuses=(500, 502, 503, 504),
+                 rng=None, sleep=time.sleep, clock=time.monotonic):
+        """初始化重试策略"""
+        self.max_attempts = max_attempts  # 最多尝试次数（含第一次）
+        self.attempt_timeout = attempt_timeout  # 单次请求超时（秒）
+        self.deadline = deadline  # 整个操作的时间上限（秒）
+        self.base_delay = base_delay  # 第一次重试前的等待上限（秒）
+        self.backoff = backoff  # 重试等待倍数
+        self.max_delay = max_delay  # 最大重试等待（秒）
+        self.retry_statuses = tuple(retry_statuses)  # 需要重试的HTTP状态码
+        self.rng = rng or random.Random()
+        self.sleep = sleep
+        self.clock = clock
+
+    def with_overrides(self, **overrides):
+        """返回修改了部分参数的副本"""
+        policy = RetryPolicy.__new__(RetryPolicy)
+        policy.__dict__.update(self.__dict__)
+        for name, value in overrides.items():
+            if not hasattr(policy, name):
+                raise AttributeError(f"未知的重试参数: {name}")
+            setattr(policy, name, value)
+        return policy
+
+    def new_deadline(self, token=None):
+        """按本策略的时间上限创建截止时间，可附带取消令牌"""
+        return Deadline(self.deadline, clock=self.clock, token=token)
+
+    def delay(self, attempt):
+        """第 attempt 次失败（从0开始）后的等待时间"""
+        cap = min(self.max_delay, self.base_delay * self.backoff ** attempt)
+        return self.rng.uniform(0, cap)
+
+    def should_retry(self, response):
+        """响应是否需要重试"""
+        return getattr(response, 'status_code', None) in self.retry_statuses
+
+    def call(self, func, deadline=None):
+        """按策略执行 func(timeout)，返回最后一次的结果
+
+        func 接收本次尝试可用的超时时间。网络异常在用完尝试次数或时间后
+        原样抛出；截止时间已到且没有可返回的结果时抛出 DeadlineExceeded。
+        """
+        if deadline is None:
+            deadline = self.new_deadline()
+        for attempt in range(self.max_attempts):
+            timeout = deadline.timeout(self.attempt_timeout)
+            try:
+                result = func(timeout)
+            except requests.RequestException:
+                if deadline.cancelled:
+                    raise Cancelled("操作已取消")
+                if not self._wait(attempt, deadline):
+                    raise
+                continue
+            if not self.should_retry(result) or not self._wait(attempt, deadline):
+                return result
+        raise DeadlineExceeded("没有可用的尝试次数")
+
+    def _wait(self, attempt, deadline):
+        """重试前等待，没有下一次尝试或剩余时间不够时返回False"""
+        if attempt + 1 >= self.max_attempts:
+            return False
+        delay = self.delay(attempt)
+        if delay >= deadline.remaining():
+            return False
+        if deadline.token is not None:
+            # 等待期间被取消时立即返回
+            if deadline.token.wait(delay):
+                raise Cancelled("操作已取消")
+        else:
+            self.sleep(delay)
+        return True
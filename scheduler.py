@@ -0,0 +1,158 @@
+import concurrent.futures
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+
+class Job:
+    """调度器中的一个任务，cancel() 后不再执行"""
+
+    def __init__(self, func, args, kwargs, interval=None, jitter=0.0, pause_when_idle=False,
+                 inline=False):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.interval = interval  # 周期任务的执行间隔（秒），一次性任务为None
+        self.jitter = jitter  # 间隔的随机抖动比例
+        self.pause_when_idle = pause_when_idle  # 空闲时是否暂停
+        self.inline = inline  # 是否直接在调度线程中执行
+        self.cancelled = False
+
+    @property
+    def name(self):
+        return getattr(self.func, '__qualname__', repr(self.func))
+
+    def cancel(self):
+        """取消任务，正在执行的这一次不受影响"""
+        self.cancelled = True
+
+
+class Scheduler:
+    """进程内的定时任务调度
+
+    所有延时任务和周期任务放在同一个按执行时间排序的堆里，由一个调度线程
+    等待最早到期的任务，到期后交给固定大小的线程池执行，不再为每个任务
+    单独开线程；耗时极短的计时回调可以 inline 直接在调度线程中执行，
+    不会因为线程池被长任务占满而推迟。周期任务在上一次执行结束后才安排
+    下一次，间隔可加随机抖动。设置了 idle_after 时，pause_when_idle 的
+    周期任务在用户空闲（idle_after 秒内没有调用 touch()）时暂停，再次
+    touch() 后立即恢复；不设置时从不暂停。调度线程在第一次安排任务时才启动。
+    """
+
+    def __init__(self, workers=4, idle_after=None, rng=None, clock=time.monotonic):
+        """初始化调度器"""
+        self.idle_after = idle_after  # 多久没有操作算空闲（秒），None 表示不判断空闲
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.logger = logging.getLogger('VIPParser')
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                           thread_name_prefix="Scheduler")
+        self._heap = []  # (执行时间, 序号, 任务)
+        self._counter = itertools.count()
+        self._paused = []  # 空闲期间暂停的周期任务
+        self._last_activity = clock()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._shutdown = False
+
+    @property
+    def idle(self):
+        """用户是否处于空闲状态"""
+        if self.idle_after is None:
+            return False
+        return self.clock() - self._last_activity >= self.idle_after
+
+    def touch(self):
+        """记录一次用户操作，恢复空闲时暂停的任务"""
+        with self._cond:
+            self._last_activity = now = self.clock()
+            paused, self._paused = self._paused, []
+            for job in paused:
+                self._push(job, now)
+
+    def call_later(self, delay, func, *args, inline=False, **kwargs):
+        """delay 秒后在线程池中执行一次 func，返回 Job
+
+        inline 为True时直接在调度线程中执行，func 必须很快返回（如只是提交任务）。
+        """
+        job = Job(func, args, kwargs, inline=inline)
+        with self._cond:
+            self._push(job, self.clock() + delay)
+        return job
+
+    def call_every(self, interval, func, *args, delay=None, jitter=0.0,
+                   pause_when_idle=False, **kwargs):
+        """每隔 interval 秒执行一次 func，返回 Job
+
+        首次在 delay 秒后执行（默认为一个间隔），jitter 为间隔的随机抖动比例。
+        """
+        job = Job(func, args, kwargs, interval, jitter, pause_when_idle)
+        with self._cond:
+            self._push(job, self.clock() + (interval if delay is None else delay))
+        return job
+
+    def submit(self, func, *args, **kwargs):
+        """立即在线程池中执行一次 func，返回 Future"""
+        return self._pool.submit(func, *args, **kwargs)
+
+    def _push(self, job, when):
+        """把任务放入堆中（调用方需持有锁）"""
+        if self._shutdown:
+            return
+        heapq.heappush(self._heap, (when, next(self._counter), job))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="Scheduler-timer", daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    def _loop(self):
+        """调度线程：等待最早到期的任务并交给线程池"""
+        while True:
+            with self._cond:
+                while not self._shutdown:
+                    if self._heap:
+                        wait = self._heap[0][0] - self.clock()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if self._shutdown:
+                    return
+                _, _, job = heapq.heappop(self._heap)
+                if job.cancelled:
+                    continue
+                if job.pause_when_idle and self.idle:
+                    self._paused.append(job)
+                    continue
+            if job.inline:
+                self._run(job)
+                continue
+            try:
+                self._pool.submit(self._run, job)
+            except RuntimeError:
+                return  # 线程池已关闭
+
+    def _run(self, job):
+        """执行任务，周期任务执行完后安排下一次"""
+        try:
+            job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            self.logger.error(f"定时任务 {job.name} 出错: {e}")
+        finally:
+            if job.interval is not None and not job.cancelled:
+                delay = job.interval * self.rng.uniform(1 - job.jitter, 1 + job.jitter)
+                with self._cond:
+                    self._push(job, self.clock() + delay)
+
+    def shutdown(self, wait=False):
+        """停止调度，丢弃尚未执行的任务"""
+        with self._cond:
+            self._shutdown = True
+            self._heap.clear()
+            self._paused.clear()
+            self._cond.notify()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,56 @@
+import concurrent.futures
+import threading
+
+
+class SingleFlight:
+    """合并同时发出的相同请求
+
+    同一个键同一时刻只执行一次，执行期间到达的调用者等待并共用
+    这次的结果（或异常）。执行结束后键即被移除，之后的调用会重新执行，
+    因此这里不做缓存。被合并的调用次数累加到 metrics[metrics_name]。
+    """
+
+    def __init__(self, metrics=None, metrics_name='coalesced_requests'):
+        """初始化"""
+        self.metrics = metrics if metrics is not None else {}
+        self.metrics_name = metrics_name
+        self.metrics.setdefault(metrics_name, 0)
+        self._calls = {}  # 键 -> 正在执行的调用的 Future
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """执行 func(*args, **kwargs)，同一键已有调用在执行时等待其结果"""
+        return self.do_waiting(key, concurrent.futures.Future.result, func, *args, **kwargs)
+
+    def do_waiting(self, key, wait, func, *args, **kwargs):
+        """同 do()，但同一键已有调用在执行时通过 wait(future) 取得结果
+
+        wait 可以在等待时加入超时或取消，提前返回时应抛出异常。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = concurrent.futures.Future()
+                call.set_running_or_notify_cancel()
+            else:
+                self.metrics[self.metrics_name] += 1
+        if not leader:
+            return wait(call)
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self):
+        """正在执行的调用数量"""
+        with self._lock:
+            return len(self._calls)
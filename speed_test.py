@@ -0,0 +1,198 @@
+import concurrent.futures
+import socket
+import ssl
+import statistics
+import time
+from urllib.parse import urljoin, urlsplit
+
+from cancellation import Cancelled
+
+
+# 分阶段计时的名称
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'total')
+
+# 需要跟随的重定向状态码
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+def summarize(values):
+    """汇总一组耗时：最小值、中位数、p95 和抖动（相邻两次差值绝对值的平均）"""
+    if not values:
+        return None
+    jitter = 0.0
+    if len(values) > 1:
+        jitter = sum(abs(b - a) for a, b in zip(values, values[1:])) / (len(values) - 1)
+    return {
+        'min': min(values),
+        'median': statistics.median(values),
+        'p95': statistics.quantiles(values, n=20, method='inclusive')[-1] if len(values) > 1 else values[0],
+        'jitter': jitter,
+    }
+
+
+class LineSpeed:
+    """一条线路（接口）的测速结果"""
+
+    def __init__(self, names, url):
+        self.names = names  # 指向该接口的全部线路名称
+        self.url = url  # 测速地址
+        self.samples = []  # 每次采样的计时，见 SpeedTester.measure
+        self.errors = []  # 失败采样的错误信息
+
+    @property
+    def ok_samples(self):
+        return [sample for sample in self.samples if sample['ok']]
+
+    @property
+    def success(self):
+        """是否至少有一次采样成功"""
+        return bool(self.ok_samples)
+
+    def summary(self, phase):
+        """成功采样在某个阶段的汇总"""
+        return summarize([sample[phase] for sample in self.ok_samples if sample[phase] is not None])
+
+
+class SpeedTester:
+    """并发测速
+
+    直接用套接字发出 HEAD 请求，分别计时 DNS 解析、TCP 连接、TLS 握手和
+    首字节时间（TTFB）。每条线路采样 samples 次，最多 concurrency 个采样
+    同时进行。与 requests 一样跟随重定向，最终状态码由 is_success 判断
+    是否可用（默认要求为200）。
+    """
+
+    def __init__(self, samples=3, concurrency=6, timeout=5, user_agent='Mozilla/5.0',
+                 token=None, is_success=None, max_redirects=5, clock=time.perf_counter):
+        """初始化"""
+        self.samples = samples  # 每条线路的采样次数
+        self.concurrency = concurrency  # 同时进行的采样数
+        self.timeout = timeout  # 每个阶段的超时（秒）
+        self.user_agent = user_agent
+        self.token = token  # 取消令牌，可为None
+        self.is_success = is_success or (lambda status: status == 200)  # 最终状态码是否算可用
+        self.max_redirects = max_redirects  # 最多跟随的重定向次数
+        self.clock = clock
+
+    def measure(self, url):
+        """对链接采样一次，返回各阶段耗时（秒）、最终状态码和重定向次数
+
+        dns、connect、tls、ttfb 为第一个请求的耗时（HTTP 链接的 tls 为None），
+        total 包含跟随重定向的全部耗时。
+        """
+        start = self.clock()
+        timings = None
+        for redirects in range(self.max_redirects + 1):
+            hop = self._request(url)
+            if timings is None:
+                timings = hop
+            status, location = hop['status'], hop['location']
+            if status not in REDIRECT_STATUSES or not location:
+                break
+            url = urljoin(url, location)
+        del timings['location']
+        timings['total'] = self.clock() - start
+        timings['status'] = status
+        timings['redirects'] = redirects
+        timings['ok'] = status is not None and self.is_success(status)
+        return timings
+
+    def _request(self, url):
+        """发出一次 HEAD 请求，返回各阶段耗时、状态码和重定向地址"""
+        if self.token is not None:
+            self.token.raise_if_cancelled()
+        parts = urlsplit(url)
+        https = parts.scheme == 'https'
+        host = parts.hostname
+        port = parts.port or (443 if https else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        timings = dict.fromkeys(PHASES)
+        start = self.clock()
+        addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        timings['dns'] = self.clock() - start
+
+        mark = self.clock()
+        sock = socket.create_connection(addresses[0][4][:2], timeout=self.timeout)
+        current = [sock]  # 取消时要中断的套接字，TLS 握手后换成包装后的套接字
+
+        def abort():
+            try:
+                current[0].shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        handle = self.token.on_cancel(abort) if self.token is not None else None
+        try:
+            timings['connect'] = self.clock() - mark
+            if https:
+                mark = self.clock()
+                context = ssl.create_default_context()
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+                sock = current[0] = context.wrap_socket(sock, server_hostname=host)
+                timings['tls'] = self.clock() - mark
+
+            request = (f"HEAD {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                       f"User-Agent: {self.user_agent}\r\nAccept: */*\r\n"
+                       f"Connection: close\r\n\r\n")
+            mark = self.clock()
+            sock.sendall(request.encode('utf-8'))
+            data = sock.recv(1)
+            timings['ttfb'] = self.clock() - mark
+            while b'\r\n\r\n' not in data and len(data) < 65536:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+        except (OSError, ValueError):
+            if self.token is not None and self.token.cancelled:
+                raise Cancelled("操作已取消")
+            raise
+        finally:
+            if handle is not None:
+                self.token.remove(handle)
+            sock.close()
+
+        lines = data.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+        try:
+            timings['status'] = int(lines[0].split()[1])
+        except (IndexError, ValueError):
+            timings['status'] = None
+        timings['location'] = None
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'location':
+                timings['location'] = value.strip()
+        return timings
+
+    def run(self, lines, on_result=None):
+        """并发测速，lines 为 [(线路名称列表, 测速地址)]，返回 LineSpeed 列表
+
+        某条线路的全部采样完成后，在调用线程中调用 on_result(LineSpeed)。
+        """
+        results = [LineSpeed(names, url) for names, url in lines]
+        remaining = {id(result): self.samples for result in results}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency,
+                                                   thread_name_prefix="SpeedTest") as pool:
+            futures = {pool.submit(self.measure, result.url): result
+                       for _ in range(self.samples) for result in results}
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    result = futures[future]
+                    try:
+                        result.samples.append(future.result())
+                    except Cancelled:
+                        raise
+                    except Exception as e:
+                        result.errors.append(str(e) or type(e).__name__)
+                    remaining[id(result)] -= 1
+                    if remaining[id(result)] == 0 and on_result is not None:
+                        on_result(result)
+            except Cancelled:
+                for future in futures:
+                    future.cancel()
+                raise
+        return results
@@ -0,0 +1,144 @@
+import functools
+import re
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlsplit
+
+
+# 支持的视频网站：(平台标识, 名称, 域名)
+PLATFORMS = [
+    ('iqiyi', '爱奇艺', ('iqiyi.com',)),
+    ('qq', '腾讯视频', ('v.qq.com',)),
+    ('youku', '优酷视频', ('youku.com',)),
+    ('mgtv', '芒果TV', ('mgtv.com',)),
+    ('bilibili', '哔哩哔哩', ('bilibili.com', 'b23.tv')),
+    ('sohu', '搜狐视频', ('tv.sohu.com',)),
+    ('pptv', 'PP视频', ('pptv.com',)),
+    ('1905', '1905电影网', ('1905.com',)),
+]
+
+# 分享、统计用的跟踪参数，不影响打开的是哪个视频
+_TRACKING_PARAMS = frozenset([
+    'spm', 'vfrm', 'share_source', 'share_medium', 'share_plat', 'share_from', 'share_tag',
+    'ptag', 'fpa', 'from', 'vd_source', 'frp', 'refer', 'source', 'scm', 'utm_source',
+    'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'timestamp', 'unique_k',
+])
+
+# 各平台从路径中提取视频ID的规则，按顺序尝试
+_ID_PATTERNS = {
+    'iqiyi': [re.compile(r'/([vwa]_[0-9a-z]+)\.html', re.I)],
+    'qq': [
+        re.compile(r'/x/cover/([0-9a-z]+)/([0-9a-z]+)\.html', re.I),
+        re.compile(r'/x/(?:cover|page)/([0-9a-z]+)\.html', re.I),
+    ],
+    'youku': [re.compile(r'/id_([0-9a-z]+)=*\.html', re.I)],
+    'mgtv': [re.compile(r'/[bl]/(\d+)/(\d+)\.html', re.I)],
+    'bilibili': [
+        re.compile(r'/video/(BV[0-9a-z]+|av\d+)', re.I),
+        re.compile(r'/bangumi/play/((?:ep|ss)\d+)', re.I),
+    ],
+    'sohu': [re.compile(r'/v/([0-9a-z=_-]+)\.html', re.I), re.compile(r'/(n\d+)\.shtml', re.I)],
+    'pptv': [re.compile(r'/show/([0-9a-z]+)\.html', re.I)],
+    '1905': [re.compile(r'/play/(\d+)\.shtml', re.I)],
+}
+
+
+class PlatformIndex:
+    """主机名到平台的后缀索引
+
+    建立时把所有域名放进字典，查询时从完整主机名开始逐级去掉最左边的
+    一段去查表，只有主机名等于某个域名或以 ".域名" 结尾才算匹配，
+    notiqiyi.com.evil 这样只是包含域名的主机不会被误认。
+    批量解析时主机名高度重复，查询结果按主机名缓存。
+    """
+
+    def __init__(self, platforms=PLATFORMS):
+        """根据平台列表建立索引"""
+        self._suffixes = {}
+        for platform, _, domains in platforms:
+            for domain in domains:
+                self._suffixes[domain.lower()] = platform
+        self.lookup = functools.lru_cache(maxsize=1024)(self._lookup)
+
+    def _lookup(self, host):
+        """返回主机名对应的平台标识，不支持的网站返回None"""
+        host = host.lower().rstrip('.')
+        start = 0
+        while True:
+            platform = self._suffixes.get(host[start:])
+            if platform is not None:
+                return platform
+            start = host.find('.', start) + 1
+            if start == 0:
+                return None
+
+
+_INDEX = PlatformIndex()
+
+
+def match_platform(host):
+    """根据主机名返回平台标识，不支持的网站返回None"""
+    return _INDEX.lookup(host)
+
+
+def identify(url):
+    """识别视频链接，返回 (平台标识, urlsplit结果)，不支持的链接返回None"""
+    try:
+        parsed = urlsplit(url.strip())
+    except ValueError:
+        return None
+    if parsed.scheme not in ('http', 'https'):
+        return None
+    platform = match_platform(parsed.hostname or '')
+    if platform is None:
+        return None
+    return platform, parsed
+
+
+def canonicalize(url):
+    """把视频链接归一化为 (平台标识, 视频ID)，不支持的链接返回None
+
+    去掉跟踪参数、锚点和移动端域名的差异，同一集视频不同来源的链接
+    得到相同的结果。
+    """
+    identified = identify(url)
+    if identified is None:
+        return None
+    platform, parsed = identified
+
+    path = parsed.path
+    query = parse_qs(parsed.query)
+
+    # 腾讯视频移动端播放页把ID放在参数里
+    if platform == 'qq' and ('vid' in query or 'cid' in query):
+        parts = [query[name][0] for name in ('cid', 'vid') if name in query]
+        return platform, '/'.join(parts)
+
+    for pattern in _ID_PATTERNS.get(platform, ()):
+        match = pattern.search(path)
+        if match:
+            video_id = '/'.join(match.groups())
+            # B站多P视频用 p 参数区分分集
+            if platform == 'bilibili' and query.get('p', ['1'])[0] not in ('', '1'):
+                video_id += f"?p={query['p'][0]}"
+            return platform, video_id
+
+    # 没有匹配到已知规则时，用路径加去掉跟踪参数后的其余参数作为ID，
+    # 视频可能由参数区分（如 ?vid=），不能整体丢弃
+    params = sorted((name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+                    if name.lower() not in _TRACKING_PARAMS)
+    video_id = path.rstrip('/') or '/'
+    if params:
+        video_id += '?' + urlencode(params)
+    return platform, video_id
+
+
+def video_identity(url):
+    """返回 (平台标识, 缓存键)，只解析一次链接；不支持的链接返回 (None, 原链接)"""
+    canonical = canonicalize(url)
+    if canonical is None:
+        return None, url.strip()
+    return canonical[0], f"{canonical[0]}:{canonical[1]}"
+
+
+def canonical_key(url):
+    """返回视频链接的缓存键，不支持的链接原样返回"""
+    return video_identity(url)[1]